@@ -0,0 +1,501 @@
+import math
+import bisect
+import numpy as np
+from profiling import profiled
+
+MOLAR_MASS_HELIUM = 4.002602 / 1000  # kg / mol
+GAS_CONSTANT = 8.314  # (m^3 Pa) / (K mol)
+MOLAR_MASS_DRY_AIR = 28.96 / 1000 # kg / mol
+MOLAR_MASS_WATER_VAPOR = 18.02 / 1000  # kg / mol
+GRAVITY = 9.81  # Acceleration due to gravity in m/s^2
+DRAG_COEFFICIENT_SPHERE = 0.47  # Drag coefficient for a sphere
+
+# One sounding level, in the column order of the psl.noaa.gov table (missing values are NaN)
+SOUNDING_DTYPE = np.dtype([('pressure', 'f8'), ('height', 'f8'), ('temperature', 'f8'), ('specific_humidity', 'f8'),
+                           ('relative_humidity', 'f8'), ('wind_speed', 'f8'), ('wind_direction', 'f8')])
+
+# Sounding rows as a SOUNDING_DTYPE array, -999.0 (missing) becomes NaN
+def sounding_array(data):
+    if getattr(data, 'dtype', None) == SOUNDING_DTYPE:
+        return data
+    values = np.array(data, dtype=float).reshape(-1, len(SOUNDING_DTYPE.names))
+    values[values == -999.0] = np.nan
+    return np.ascontiguousarray(values).view(SOUNDING_DTYPE)[:, 0]
+
+# Define the exponential model
+# This produces Pa
+def exponential_model(h, P0, H):
+    return P0 * np.exp(-h / H)
+
+def molar_mass_humid_air(spec_humid):
+    r = spec_humid / (1 - spec_humid)
+    X_w = r / (r + MOLAR_MASS_DRY_AIR / MOLAR_MASS_WATER_VAPOR)
+    X_d = 1 - X_w
+    return X_d * MOLAR_MASS_DRY_AIR + X_w * MOLAR_MASS_WATER_VAPOR
+
+# Piecewise linear wind profile with the segment slopes precomputed once per sounding
+# Heights are looked up with a binary search, so scalars and whole ensembles cost O(log n) per altitude
+# Scalar heights take a plain-float path (bisect on Python lists), arrays the vectorized numpy one
+# segments takes the output of segment_parameters() from an earlier WindField of the same profile
+class WindField:
+    def __init__(self, height, wind_speed, wind_direction, segments=None):
+        self.height = np.asarray(height, dtype=float)
+        self.wind_speed = np.asarray(wind_speed, dtype=float)
+        self.wind_direction = np.asarray(wind_direction, dtype=float)
+        if segments is not None:
+            self.speed_slope = np.asarray(segments['speed_slope'])
+            self.speed_intercept = np.asarray(segments['speed_intercept'])
+            self.direction_slope = np.asarray(segments['direction_slope'])
+            self.direction_intercept = np.asarray(segments['direction_intercept'])
+        else:
+            dh = np.diff(self.height)
+            self.speed_slope = np.diff(self.wind_speed) / dh
+            self.speed_intercept = self.wind_speed[:-1] - self.speed_slope * self.height[:-1]
+            self.direction_slope = np.diff(self.wind_direction) / dh
+            self.direction_intercept = self.wind_direction[:-1] - self.direction_slope * self.height[:-1]
+        self._height_list = self.height.tolist()
+        self._speed_list = (self.wind_speed.tolist(), self.speed_slope.tolist(), self.speed_intercept.tolist())
+        self._direction_list = (self.wind_direction.tolist(), self.direction_slope.tolist(), self.direction_intercept.tolist())
+
+    def segment_parameters(self):
+        return {'speed_slope': self.speed_slope, 'speed_intercept': self.speed_intercept,
+                'direction_slope': self.direction_slope, 'direction_intercept': self.direction_intercept}
+
+    # Index of the segment below the first level at or above h, clamped at both ends
+    def segment(self, h):
+        index = np.searchsorted(self.height, h, side='left')
+        return np.clip(index, 1, len(self.height) - 1) - 1
+
+    def _evaluate(self, h, values, slope, intercept, segment=None):
+        h = np.asarray(h, dtype=float)
+        if segment is None:
+            segment = self.segment(h)
+        result = slope[segment] * h + intercept[segment]
+        result = np.where(h <= self.height[0], values[0], result)
+        result = np.where(h >= self.height[-1], values[-1], result)
+        return result[()]
+
+    # Scalar segment with the same clamping as segment(), -1 / len - 1 mark heights below / above the profile
+    def _scalar_segment(self, h):
+        heights = self._height_list
+        if h <= heights[0]:
+            return -1
+        if h >= heights[-1]:
+            return len(heights) - 1
+        return bisect.bisect_left(heights, h) - 1
+
+    @staticmethod
+    def _evaluate_scalar(h, segment, lists):
+        values, slope, intercept = lists
+        if segment < 0:
+            return values[0]
+        if segment == len(slope):
+            return values[-1]
+        return slope[segment] * h + intercept[segment]
+
+    def predict_wind_speed(self, h):
+        if isinstance(h, (int, float)):
+            return self._evaluate_scalar(h, self._scalar_segment(h), self._speed_list)
+        return self._evaluate(h, self.wind_speed, self.speed_slope, self.speed_intercept)
+
+    def predicted_wind_direction(self, h):
+        if isinstance(h, (int, float)):
+            return self._evaluate_scalar(h, self._scalar_segment(h), self._direction_list)
+        return self._evaluate(h, self.wind_direction, self.direction_slope, self.direction_intercept)
+
+    # Unit vector of the wind, same convention as vectorize_wind_direction in model.py
+    # (-cos(d + 90) == sin(d) and -sin(d - 90) == cos(d))
+    def direction_vector(self, h):
+        direction = np.radians(self.predicted_wind_direction(h))
+        return np.sin(direction), np.cos(direction)
+
+    # Wind velocity components (u, v) in m/s, sharing one lookup between speed and direction
+    @profiled('wind.wind_velocity')
+    def wind_velocity(self, h):
+        if isinstance(h, (int, float)):
+            h = float(h)
+            segment = self._scalar_segment(h)
+            speed = self._evaluate_scalar(h, segment, self._speed_list)
+            direction = math.radians(self._evaluate_scalar(h, segment, self._direction_list))
+            return speed * math.sin(direction), speed * math.cos(direction)
+        h = np.asarray(h, dtype=float)
+        segment = self.segment(h)
+        speed = self._evaluate(h, self.wind_speed, self.speed_slope, self.speed_intercept, segment)
+        direction = np.radians(self._evaluate(h, self.wind_direction, self.direction_slope, self.direction_intercept, segment))
+        return speed * np.sin(direction), speed * np.cos(direction)
+
+# Fits the same models as model.py to one sounding (rows from retrieve_table or a SOUNDING_DTYPE array)
+# Every predict_* method accepts a scalar height or a numpy array of heights
+class Atmosphere:
+    # fit takes the output of fit_parameters() from an earlier Atmosphere of the same sounding and skips fitting
+    def __init__(self, data, temperature_degree=4, humidity_degree=3, fit=None):
+        # Create numpy arrays from the data
+        sounding = sounding_array(data)
+        self.height = sounding['height'].copy()
+        self.pressure = sounding['pressure'] * 100 # convert to Pa from mB
+        self.temperature = sounding['temperature'].copy()
+        self.specific_humidity = np.nan_to_num(sounding['specific_humidity'], nan=0.0)
+        self.wind_speed = sounding['wind_speed'].copy()
+        self.wind_direction = sounding['wind_direction'].copy()
+
+        if fit is None:
+            fit = self.fit(temperature_degree, humidity_degree)
+        self.popt = np.asarray(fit['popt'])
+        self.P0, self.H = self.popt
+        self.coefficients = np.asarray(fit['coefficients'])
+        self.coefficients_humidity = np.asarray(fit['coefficients_humidity'])
+        self.specific_humidity_first_zero_index = int(fit['specific_humidity_first_zero_index'])
+        self.humidity_cutoff_height = self.height[self.specific_humidity_first_zero_index]
+
+        self.wind = WindField(self.height, self.wind_speed, self.wind_direction, segments=fit if 'speed_slope' in fit else None)
+
+    def fit(self, temperature_degree=4, humidity_degree=3):
+        from scipy.optimize import curve_fit
+
+        # Fit pressure to an exponential
+        # [pMin, tMin] , [pMax, tMax]
+        bounds = ([0, 200], [120000, 32000])
+        popt, _ = curve_fit(exponential_model, self.height, self.pressure, p0=[100000, 7500], bounds=bounds)
+
+        # Fit temperatures to a polynomial
+        coefficients = np.polyfit(self.height, self.temperature, temperature_degree)
+
+        # Fit humidity below the first missing value to a polynomial
+        zeros = np.where(self.specific_humidity == 0)[0]
+        cutoff = zeros[0] if len(zeros) else len(self.height) - 1
+        coefficients_humidity = np.polyfit(self.height[:cutoff], self.specific_humidity[:cutoff], humidity_degree)
+        return {'popt': popt, 'coefficients': coefficients, 'coefficients_humidity': coefficients_humidity,
+                'specific_humidity_first_zero_index': cutoff}
+
+    # Everything needed to rebuild this Atmosphere from the same sounding without fitting again
+    def fit_parameters(self):
+        return dict({'popt': self.popt, 'coefficients': self.coefficients, 'coefficients_humidity': self.coefficients_humidity,
+                     'specific_humidity_first_zero_index': self.specific_humidity_first_zero_index},
+                    **self.wind.segment_parameters())
+
+    # Predict pressure at height h
+    def predict_pressure(self, h):
+        return self.P0 * np.exp(-np.asarray(h) / self.H)
+
+    # Predict the temperature at height h
+    def predict_temp(self, h):
+        return np.polyval(self.coefficients, h)
+
+    def predict_specific_humidity(self, h):
+        val = np.polyval(self.coefficients_humidity, h)
+        return np.where((val < 0) | (np.asarray(h) > self.humidity_cutoff_height), 0.0, val)
+
+    def predict_air_density(self, h):
+        return self.predict_pressure(h) * molar_mass_humid_air(self.predict_specific_humidity(h)) / (GAS_CONSTANT * self.predict_temp(h))
+
+    def predict_wind_speed(self, h):
+        return self.wind.predict_wind_speed(h)
+
+    def predicted_wind_direction(self, h):
+        return self.wind.predicted_wind_direction(h)
+
+    def wind_velocity(self, h):
+        return self.wind.wind_velocity(h)
+
+    # Pressure, temperature, air density and wind (u, v) at h, every fitted model evaluated once
+    # wind=False leaves out the wind and returns only the first three
+    @profiled('atmosphere.conditions')
+    def conditions(self, h, wind=True):
+        pressure = self.predict_pressure(h)
+        temperature = self.predict_temp(h)
+        air_density = pressure * molar_mass_humid_air(self.predict_specific_humidity(h)) / (GAS_CONSTANT * temperature)
+        if not wind:
+            return pressure, temperature, air_density
+        return (pressure, temperature, air_density) + tuple(self.wind.wind_velocity(h))
+
+# Samples the atmosphere (and optionally one balloon's derived quantities) once on a uniform altitude grid
+# Per-step queries are answered by linear interpolation on the grid, so a lookup costs O(1)
+# It exposes the same predict_* and wind_velocity methods as Atmosphere, so it can stand in for it in an Ensemble
+class AtmosphereTable:
+    def __init__(self, atmosphere, balloon=None, max_height=40000, resolution=1.0):
+        self.atmosphere = atmosphere
+        self.wind = atmosphere.wind
+        self.resolution = resolution
+        self.heights = np.arange(0, max_height + resolution, resolution)
+        self.last_index = len(self.heights) - 1
+
+        self.pressure = atmosphere.predict_pressure(self.heights)
+        self.temperature = atmosphere.predict_temp(self.heights)
+        self.specific_humidity = atmosphere.predict_specific_humidity(self.heights)
+        self.air_density = self.pressure * molar_mass_humid_air(self.specific_humidity) / (GAS_CONSTANT * self.temperature)
+
+        self.balloon = balloon
+        if balloon is not None:
+            full_volume = 4/3 * np.pi * balloon.radius**3
+            volume = balloon.moles_helium * GAS_CONSTANT * self.temperature / self.pressure
+            self.balloon_volume = np.minimum(volume, full_volume)
+            self.bouyant = GRAVITY * self.balloon_volume * (self.air_density - balloon.mass_helium / self.balloon_volume)
+            self.gravitational_force = GRAVITY * balloon.mass_balloon + GRAVITY * balloon.mass_payload
+            excess = self.bouyant - self.gravitational_force
+            self.rise_velocity = np.sqrt(np.maximum(excess, 0) / (balloon.drag_coefficient * balloon.cross_sectional_area))
+            # Pressure of the helium above the surrounding air once the envelope is fully stretched
+            self.superpressure = balloon.moles_helium * GAS_CONSTANT * self.temperature / full_volume - self.pressure
+
+    # Grid index and fraction of h, clamped to the table range
+    # Computed once and shared by every quantity looked up at the same height (see lookup)
+    # A scalar height is handled with plain float math, arrays with one vectorized lookup
+    def locate(self, h):
+        if isinstance(h, (int, float)):
+            position = min(max(float(h) / self.resolution, 0.0), self.last_index)
+            index = min(math.floor(position), self.last_index - 1)
+            return index, position - index
+        position = np.clip(np.asarray(h, dtype=float) / self.resolution, 0, self.last_index)
+        index = np.minimum(position.astype(int), self.last_index - 1)
+        return index, position - index
+
+    # Linear interpolation of values at a location from locate()
+    @staticmethod
+    def lookup(values, location):
+        index, fraction = location
+        if isinstance(index, int):
+            low = values.item(index)
+            return low + fraction * (values.item(index + 1) - low)
+        return (values[index] + fraction * (values[index + 1] - values[index]))[()]
+
+    # Linear interpolation on the uniform grid, clamped to the table range
+    @profiled('table.interpolate')
+    def interpolate(self, values, h):
+        return self.lookup(values, self.locate(h))
+
+    def predict_pressure(self, h):
+        return self.interpolate(self.pressure, h)
+
+    def predict_temp(self, h):
+        return self.interpolate(self.temperature, h)
+
+    def predict_specific_humidity(self, h):
+        return self.interpolate(self.specific_humidity, h)
+
+    def predict_air_density(self, h):
+        return self.interpolate(self.air_density, h)
+
+    def wind_velocity(self, h):
+        return self.wind.wind_velocity(h)
+
+    # Pressure, temperature, air density and (unless wind=False) wind (u, v) at h, sharing one grid lookup
+    @profiled('table.conditions')
+    def conditions(self, h, wind=True):
+        location = self.locate(h)
+        state = (self.lookup(self.pressure, location), self.lookup(self.temperature, location),
+                 self.lookup(self.air_density, location))
+        return state + tuple(self.wind.wind_velocity(h)) if wind else state
+
+    def balloon_volume_at_height(self, h):
+        return self.interpolate(self.balloon_volume, h)
+
+    def bouyant_force(self, h):
+        return self.interpolate(self.bouyant, h)
+
+    def terminal_rise_velocity(self, h):
+        return self.interpolate(self.rise_velocity, h)
+
+    def superpressure_at_height(self, h):
+        return self.interpolate(self.superpressure, h)
+
+    # Lowest grid height where the balloon stops being positively buoyant (None if it never does)
+    def neutral_buoyancy_height(self):
+        excess = self.bouyant - self.gravitational_force
+        sinking = np.where((excess[:-1] > 0) & (excess[1:] <= 0))[0]
+        if len(sinking) == 0:
+            return None
+        i = sinking[0]
+        return self.heights[i] + self.resolution * excess[i] / (excess[i] - excess[i + 1])
+
+    # Float altitude for many balloon configurations at once (the arguments broadcast against each other)
+    # Net lift is g * (min(n_helium * M_air(h), V_full * rho_air(h)) - total mass), so the float altitude is the first
+    # grid height where either term drops to the total mass. Running minima of M_air and rho_air from the ground make
+    # both conditions monotonic, so each configuration is bracketed with a binary search and refined linearly
+    # Returns nan where the balloon cannot leave the ground and inf where it is still rising at the top of the table
+    def neutral_buoyancy_heights(self, radius, mass_helium, mass_balloon, mass_payload=0):
+        if not hasattr(self, 'lowest_molar_mass'):
+            self.molar_mass = self.air_density * GAS_CONSTANT * self.temperature / self.pressure
+            self.lowest_molar_mass = np.minimum.accumulate(self.molar_mass)
+            self.lowest_air_density = np.minimum.accumulate(self.air_density)
+        radius, mass_helium, mass_balloon, mass_payload = np.broadcast_arrays(
+            *[np.asarray(value, dtype=float) for value in (radius, mass_helium, mass_balloon, mass_payload)])
+        moles_helium = mass_helium / MOLAR_MASS_HELIUM
+        full_volume = 4/3 * np.pi * radius**3
+        total_mass = mass_helium + mass_balloon + mass_payload
+
+        # First grid index where each condition holds (searchsorted needs increasing arrays, hence the negation)
+        slack = np.searchsorted(-self.lowest_molar_mass, -(total_mass / moles_helium), side='left')
+        full = np.searchsorted(-self.lowest_air_density, -(total_mass / full_volume), side='left')
+        index = np.minimum(slack, full)
+
+        inside = (index > 0) & (index <= self.last_index)
+        below = np.clip(index - 1, 0, self.last_index)
+        above = np.clip(index, 0, self.last_index)
+        def excess(i):
+            return np.minimum(moles_helium * self.molar_mass[i], full_volume * self.air_density[i]) - total_mass
+        lift_below = excess(below)
+        lift_above = excess(above)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            heights = self.heights[below] + self.resolution * lift_below / (lift_below - lift_above)
+        heights = np.where(inside, heights, np.where(index == 0, np.nan, np.inf))
+        return heights[()]
+
+# Float altitude map over every combination of the given 1-D parameter axes
+# Returns an array of shape (len(radii), len(helium_masses), len(balloon_masses), len(payload_masses))
+def float_altitude_map(table, radii, helium_masses, balloon_masses, payload_masses=(0,)):
+    return table.neutral_buoyancy_heights(*np.ix_(np.atleast_1d(radii), np.atleast_1d(helium_masses),
+                                                   np.atleast_1d(balloon_masses), np.atleast_1d(payload_masses)))
+
+# Atmosphere that changes in time, built from soundings taken at the given UTC hours (e.g. 00/06/12/18)
+# Soundings may be rows from retrieve_table or already fitted Atmosphere objects
+# Each sounding is fitted and sampled on the same altitude grid as AtmosphereTable, then all of them are stacked
+# into (time, altitude) arrays. Queries use bilinear interpolation; t is seconds after 00 UTC of the first sounding
+# and is clamped to the sounding times, so a flight past the last sounding keeps seeing that sounding
+class AtmosphereField:
+    def __init__(self, soundings, hours=(0, 6, 12, 18), balloon=None, max_height=40000, resolution=1.0,
+                 temperature_degree=4, humidity_degree=3):
+        hours = list(hours)
+        if len(hours) != len(soundings):
+            raise ValueError(f"Got {len(soundings)} soundings for {len(hours)} hours")
+        if any(later <= earlier for earlier, later in zip(hours, hours[1:])):
+            raise ValueError(f"Sounding hours must be strictly increasing, got {hours}")
+        atmospheres = [data if isinstance(data, Atmosphere) else Atmosphere(data, temperature_degree, humidity_degree)
+                       for data in soundings]
+        tables = [AtmosphereTable(atmosphere, balloon, max_height, resolution) for atmosphere in atmospheres]
+        times = [hour * 3600 for hour in hours]
+        # A single sounding still needs two time slices to interpolate between
+        if len(tables) == 1:
+            tables = tables * 2
+            times = [times[0], times[0] + 1]
+        self.times = np.asarray(times, dtype=float)
+        self._time_list = self.times.tolist()
+        self.resolution = resolution
+        self.heights = tables[0].heights
+        self.last_index = len(self.heights) - 1
+
+        def stack(name):
+            return np.stack([getattr(table, name) for table in tables])
+        self.pressure = stack('pressure')
+        self.temperature = stack('temperature')
+        self.specific_humidity = stack('specific_humidity')
+        self.air_density = stack('air_density')
+        winds = [table.wind.wind_velocity(self.heights) for table in tables]
+        self.wind_u = np.stack([u for u, v in winds])
+        self.wind_v = np.stack([v for u, v in winds])
+
+        self.balloon = balloon
+        if balloon is not None:
+            self.balloon_volume = stack('balloon_volume')
+            self.bouyant = stack('bouyant')
+            self.rise_velocity = stack('rise_velocity')
+            self.superpressure = stack('superpressure')
+            self.gravitational_force = tables[0].gravitational_force
+
+    # Grid cell of (h, t), clamped to the grid: flat indices of its four corners in a (time, altitude) array,
+    # the altitude fraction and the time weight. Computed once and shared by every quantity looked up at the
+    # same point (see lookup). Scalars are handled with plain float math, arrays with one vectorized lookup
+    def locate(self, h, t):
+        width = self.last_index + 1
+        if isinstance(t, (int, float)):
+            times = self._time_list
+            slot = min(max(bisect.bisect_right(times, t) - 1, 0), len(times) - 2)
+            weight = min(max((t - times[slot]) / (times[slot + 1] - times[slot]), 0.0), 1.0)
+        else:
+            t = np.asarray(t, dtype=float)
+            slot = np.clip(np.searchsorted(self.times, t, side='right') - 1, 0, len(self.times) - 2)
+            weight = np.clip((t - self.times[slot]) / (self.times[slot + 1] - self.times[slot]), 0, 1)
+        if isinstance(h, (int, float)) and isinstance(slot, int):
+            position = min(max(float(h) / self.resolution, 0.0), self.last_index)
+            index = min(math.floor(position), self.last_index - 1)
+        else:
+            position = np.minimum(np.maximum(np.asarray(h, dtype=float) / self.resolution, 0), self.last_index)
+            index = np.minimum(position.astype(int), self.last_index - 1)
+        corner = slot * width + index
+        return (corner, corner + 1, corner + width, corner + width + 1), position - index, weight
+
+    # Bilinear interpolation of (time, altitude) values at a location from locate()
+    @staticmethod
+    def lookup(values, location):
+        (low_before, high_before, low_after, high_after), fraction, weight = location
+        scalar = isinstance(low_before, int)
+        take = values.item if scalar else values.take
+        low = take(low_before)
+        before = low + fraction * (take(high_before) - low)
+        low = take(low_after)
+        after = low + fraction * (take(high_after) - low)
+        result = before + weight * (after - before)
+        return result if scalar else result[()]
+
+    # Bilinear interpolation in altitude and time, clamped to the grid
+    @profiled('field.interpolate')
+    def interpolate(self, values, h, t):
+        return self.lookup(values, self.locate(h, t))
+
+    def predict_pressure(self, h, t):
+        return self.interpolate(self.pressure, h, t)
+
+    def predict_temp(self, h, t):
+        return self.interpolate(self.temperature, h, t)
+
+    def predict_specific_humidity(self, h, t):
+        return self.interpolate(self.specific_humidity, h, t)
+
+    def predict_air_density(self, h, t):
+        return self.interpolate(self.air_density, h, t)
+
+    # Wind components are interpolated in time as u/v, so directions never wrap through 360 degrees
+    def wind_velocity(self, h, t):
+        location = self.locate(h, t)
+        return self.lookup(self.wind_u, location), self.lookup(self.wind_v, location)
+
+    # Wind (u, v) and terminal rise velocity of the balloon, everything one kinematic step needs, from one lookup
+    @profiled('field.velocity')
+    def velocity(self, h, t):
+        location = self.locate(h, t)
+        return self.lookup(self.wind_u, location), self.lookup(self.wind_v, location), self.lookup(self.rise_velocity, location)
+
+    # Pressure, temperature, air density and (unless wind=False) wind (u, v), sharing one grid lookup
+    @profiled('field.conditions')
+    def conditions(self, h, t, wind=True):
+        location = self.locate(h, t)
+        state = (self.lookup(self.pressure, location), self.lookup(self.temperature, location),
+                 self.lookup(self.air_density, location))
+        return state + (self.lookup(self.wind_u, location), self.lookup(self.wind_v, location)) if wind else state
+
+    def balloon_volume_at_height(self, h, t):
+        return self.interpolate(self.balloon_volume, h, t)
+
+    def bouyant_force(self, h, t):
+        return self.interpolate(self.bouyant, h, t)
+
+    def terminal_rise_velocity(self, h, t):
+        return self.interpolate(self.rise_velocity, h, t)
+
+    def superpressure_at_height(self, h, t):
+        return self.interpolate(self.superpressure, h, t)
+
+    def at_time(self, t):
+        return AtmosphereSnapshot(self, t)
+
+# An AtmosphereField frozen at time t, with the same height-only interface as AtmosphereTable
+class AtmosphereSnapshot:
+    def __init__(self, field, t):
+        self.field = field
+        self.t = t
+
+    def predict_pressure(self, h):
+        return self.field.predict_pressure(h, self.t)
+
+    def predict_temp(self, h):
+        return self.field.predict_temp(h, self.t)
+
+    def predict_specific_humidity(self, h):
+        return self.field.predict_specific_humidity(h, self.t)
+
+    def predict_air_density(self, h):
+        return self.field.predict_air_density(h, self.t)
+
+    def wind_velocity(self, h):
+        return self.field.wind_velocity(h, self.t)
+
+    def conditions(self, h, wind=True):
+        return self.field.conditions(h, self.t, wind)
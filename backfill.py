@@ -0,0 +1,131 @@
+# Bulk backfill of reanalysis soundings into a local SoundingArchive
+# Usage: python backfill.py archive/ [--start 1948-01-01] [--end 2024-07-06] [--latitudes 40 50] [--longitudes -130 -115]
+#
+# Walks every (day, hour, grid cell) of the window through ncep_scraper.retrieve_tables in batches and writes the
+# soundings into the archive. Once a batch is in the archive its keys are appended to the journal (one JSON list
+# [year, month, day, hour, latitude, longitude] per line), so a killed job started again with the same journal
+# skips everything already done and only refetches the batch it was working on. Failed soundings are not
+# journaled and are retried on the next run
+# Requests to psl.noaa.gov still go through noaa_limiter, which caps the throughput whatever the worker count
+
+import os
+import json
+import time
+import argparse
+import datetime
+import numpy as np
+from drift import GRID_SPACING, grid_cell
+from ncep_scraper import retrieve_tables
+from sounding_archive import SoundingArchive
+
+# Coverage of the reanalysis, as in gui.py
+START_DATE = datetime.date(1948, 1, 1)
+END_DATE = datetime.date(2024, 7, 6)
+HOURS = (0, 6, 12, 18)
+
+# Reanalysis grid cells covering [lat_min, lat_max] x [lon_min, lon_max]
+def grid_cells(latitudes, longitudes, spacing=GRID_SPACING):
+    lat_min, lat_max = latitudes
+    lon_min, lon_max = longitudes
+    cells = {grid_cell(latitude, longitude, spacing)
+             for latitude in np.arange(lat_min, lat_max + spacing / 2, spacing)
+             for longitude in np.arange(lon_min, lon_max + spacing / 2, spacing)}
+    return sorted(cells)
+
+# Every (year, month, day, hour, latitude, longitude) of the window, ordered by year, cell, day and hour
+# so consecutive batches fill the same archive chunk
+def backfill_keys(start=START_DATE, end=END_DATE, hours=HOURS, cells=((45.0, -125.0),)):
+    for year in range(start.year, end.year + 1):
+        first = max(start, datetime.date(year, 1, 1))
+        last = min(end, datetime.date(year, 12, 31))
+        for latitude, longitude in cells:
+            day = first
+            while day <= last:
+                for hour in hours:
+                    yield day.year, day.month, day.day, int(hour), float(latitude), float(longitude)
+                day += datetime.timedelta(days=1)
+
+def _key(entry):
+    year, month, day, hour, latitude, longitude = entry
+    return int(year), int(month), int(day), int(hour), float(latitude), float(longitude)
+
+# Keys already recorded in the journal; a line cut short by a kill is ignored
+def read_journal(path):
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                done.add(_key(json.loads(line)))
+            except (ValueError, TypeError):
+                continue
+    return done
+
+def _format_duration(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+# Fetch every missing sounding of the window into archive (a SoundingArchive), batch_size keys at a time
+# cache is passed on to retrieve_tables: False (the default) leaves the SQLite sounding cache alone,
+# None also fills the default cache that planning runs read through retrieve_table
+# Returns (stored, failed) counts of this run
+def backfill(archive, journal, start=START_DATE, end=END_DATE, hours=HOURS, cells=((45.0, -125.0),), workers=8,
+             batch_size=256, cache=False, report_every=10.0):
+    done = read_journal(journal)
+    pending = [key for key in backfill_keys(start, end, hours, cells) if key not in done]
+    total = len(pending)
+    print(f"Backfill: {len(done)} soundings already journaled, {total} to fetch with {workers} workers")
+
+    stored = failed = 0
+    started = last_report = time.perf_counter()
+    with open(journal, 'a') as log:
+        for first in range(0, total, batch_size):
+            batch = pending[first:first + batch_size]
+            completed = []
+            for key, sounding in zip(batch, retrieve_tables(batch, workers=workers, cache=cache)):
+                if isinstance(sounding, Exception) or not len(sounding):
+                    print(f"Error: Unable to fetch sounding {key}: {sounding if isinstance(sounding, Exception) else 'empty sounding'}")
+                    failed += 1
+                    continue
+                year, month, day, hour, latitude, longitude = key
+                archive.add(latitude, longitude, datetime.datetime(year, month, day, hour), sounding)
+                completed.append(key)
+            # The archive is written before the journal, so a journaled key is always archived
+            archive.flush()
+            for key in completed:
+                log.write(json.dumps(key) + '\n')
+            log.flush()
+            os.fsync(log.fileno())
+            stored += len(completed)
+
+            now = time.perf_counter()
+            processed = first + len(batch)
+            if now - last_report >= report_every or processed == total:
+                rate = processed / (now - started)
+                print(f"Backfill: {processed}/{total} ({processed / total:.1%}), {rate:.2f} soundings/s, "
+                      f"{failed} failed, ETA {_format_duration((total - processed) / rate)}")
+                last_report = now
+    return stored, failed
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('archive', help='SoundingArchive directory to fill')
+    parser.add_argument('--journal', default=None, help='Progress journal (default: backfill.journal inside the archive)')
+    parser.add_argument('--start', type=datetime.date.fromisoformat, default=START_DATE, help='First day (YYYY-MM-DD)')
+    parser.add_argument('--end', type=datetime.date.fromisoformat, default=END_DATE, help='Last day (YYYY-MM-DD), inclusive')
+    parser.add_argument('--hours', type=int, nargs='+', default=list(HOURS), help='UTC hours of each day')
+    parser.add_argument('--latitudes', type=float, nargs=2, default=[45, 45], metavar=('MIN', 'MAX'))
+    parser.add_argument('--longitudes', type=float, nargs=2, default=[-125, -125], metavar=('MIN', 'MAX'))
+    parser.add_argument('--workers', type=int, default=8, help='Parallel fetches')
+    parser.add_argument('--batch-size', type=int, default=256, help='Soundings per archive flush and journal update')
+    parser.add_argument('--uncompressed', action='store_true', help='Store memory-mappable .npy chunks')
+    parser.add_argument('--cache', action='store_true', help='Also fill the SQLite sounding cache')
+    args = parser.parse_args()
+
+    archive = SoundingArchive(args.archive, compress=not args.uncompressed)
+    journal = args.journal or os.path.join(args.archive, 'backfill.journal')
+    cells = grid_cells(args.latitudes, args.longitudes)
+    stored, failed = backfill(archive, journal, args.start, args.end, args.hours, cells, args.workers, args.batch_size,
+                              cache=None if args.cache else False)
+    print(f"Backfill: stored {stored} soundings, {failed} failed")
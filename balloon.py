@@ -2,6 +2,7 @@ import numpy as np
 from scipy.optimize import curve_fit, fsolve
 import matplotlib.pyplot as plt
 from ncep_scraper import retrieve_table
+from atmosphere import WindField
 import math
 
 MOLAR_MASS_HELIUM = 4.002602 / 1000  # kg / mol
@@ -130,40 +131,24 @@ humidity_fit = [predict_specific_humidity(ele) for ele in heights_fit]
 
 # Predict wind speed at height
 
+# Slopes are precomputed once and heights are found by binary search
+wind_field = WindField(height, wind_speed, wind_direction)
+
 def predict_wind_speed(h):
-    if h <= height[0]:
-        return wind_speed[0]
-    if h >= height[-1]:
-        return wind_speed[-1]
-    index = 0
-    for i in range(1, len(height)):
-        if h <= height[i]:
-            index = i
-            break
-    slope = (wind_speed[index] - wind_speed[index - 1]) / (height[index] - height[index - 1])
-    b = wind_speed[index - 1] - slope * height[index - 1]
-    
-    return slope * h + b
+    return wind_field.predict_wind_speed(h)
 
 print(f"Predicted Wind Speed at 21000m : {predict_wind_speed(21000)}")
 
 def predicted_wind_direction(h):
-    if h <= height[0]:
-        return wind_direction[0]
-    if h >= height[-1]:
-        return wind_direction[-1]
-    index = 0
-    for i in range(1, len(height)):
-        if h <= height[i]:
-            index = i
-            break
-    slope = (wind_direction[index] - wind_direction[index - 1]) / (height[index] - height[index - 1])
-    b = wind_direction[index - 1] - slope * height[index - 1]
-    
-    return slope * h + b
+    return wind_field.predicted_wind_direction(h)
 
 def vectorize_wind_direction(h):
-    return np.array([-math.cos((predicted_wind_direction(h)+90)/180 * math.pi), -math.sin((predicted_wind_direction(h)-90)/180 * math.pi), 0])
+    x, y = wind_field.direction_vector(h)
+    return np.array([x, y, 0])
+
+def wind_velocity_at_height(h):
+    u, v = wind_field.wind_velocity(h)
+    return np.array([u, v, 0])
 
 print(f"Predicted Wind Direction at 21000m : {predicted_wind_direction(21000)}")
 print(f"Predicted Wind Vector at 21000m : <{vectorize_wind_direction(21000)[0]},  {vectorize_wind_direction(21000)[1]}>")
@@ -248,7 +233,7 @@ def plot_trajectory():
     for i in range(20):
         print(f'\n############### ITERATION {i+1} ##################\n')
         # Calculate the wind velocity and velocity relative to balloon
-        wind_velocity = predict_wind_speed(tracer.z) * vectorize_wind_direction(tracer.z)
+        wind_velocity = wind_velocity_at_height(tracer.z)
         print(f"Wind Velocity: {wind_velocity}")
         tracer_velocity = [tracer.vx, tracer.vy, tracer.vz]
         relative_velocity = np.array([tracer_velocity[0] - wind_velocity[0], tracer_velocity[1] - wind_velocity[1], tracer_velocity[2] - wind_velocity[2]])
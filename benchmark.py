@@ -0,0 +1,178 @@
+# Offline benchmarks for the flight model, run against recorded soundings so no network is needed
+# Usage: python benchmark.py [-o benchmark_results.json] [--quick]
+# The parser benchmark reads the synthetic pages in fixtures/, written in the psl.noaa.gov profile format
+# Results are written as JSON so runs from different versions can be compared
+
+import os
+import re
+import glob
+import json
+import time
+import platform
+import argparse
+import subprocess
+import tracemalloc
+import numpy as np
+from atmosphere import Atmosphere, AtmosphereTable, AtmosphereField
+from ensemble import Ensemble
+from integrator import integrate_flight
+from ncep_scraper import parse_sounding
+from model import FlightModel, Balloon, radius, mass_helium, mass_balloon, mass_payload
+
+# Recorded sounding (same table as balloon.py)
+RECORDED_SOUNDING = [[1005.0, 42.0, 288.0, 0.0085517, 82.0, 10.14, 9.6],
+[1000.0, 149.0, 289.2, 0.00932, 82.0, 7.37, 7.8],
+[925.0, 813.0, 291.0, 0.0047, 34.0, 6.48, 38.1],
+[850.0, 1538.0, 291.7, 0.00299, 19.0, 4.88, 61.9],
+[700.0, 3177.0, 283.0, 0.00335, 31.0, 3.41, 185.0],
+[600.0, 4436.0, 273.7, 0.0023, 35.0, 6.08, 189.5],
+[500.0, 5868.0, 262.6, 0.001847, 54.0, 5.71, 176.0],
+[400.0, 7546.0, 250.9, 0.000539, 33.0, 6.55, 187.0],
+[300.0, 9598.0, 235.6, 0.000177, 33.0, 11.11, 200.6],
+[250.0, 10829.0, 226.6, -999.0, -999.0, 14.58, 198.8],
+[200.0, 12293.0, 223.9, -999.0, -999.0, 20.62, 199.0],
+[150.0, 14203.0, 223.6, -999.0, -999.0, 14.91, 209.3],
+[100.0, 16762.0, 211.3, -999.0, -999.0, 4.53, 210.5],
+[70.0, 18973.0, 212.8, -999.0, -999.0, 4.88, 151.9],
+[50.0, 21086.0, 216.2, -999.0, -999.0, 3.98, 107.5],
+[30.0, 24353.0, 220.2, -999.0, -999.0, 9.76, 83.5],
+[20.0, 27000.0, 225.9, -999.0, -999.0, 11.42, 86.5],
+[10.0, 31618.0, 228.0, -999.0, -999.0, 17.42, 87.4]]
+
+# Four synoptic soundings for the time-dependent benchmarks, made by perturbing the recorded one
+def recorded_soundings():
+    soundings = []
+    for k in range(4):
+        soundings.append([[row[0], row[1] * (1 + 0.005 * k), row[2] + k, row[3], row[4], row[5] * (1 + 0.1 * k), (row[6] + 10 * k) % 360]
+                          for row in RECORDED_SOUNDING])
+    return soundings
+
+def flight_model(hours=(0, 6, 12, 18)):
+    soundings = recorded_soundings()[:len(hours)]
+    return FlightModel(soundings=soundings, hours=hours, cache_dir=None,
+                       balloon=Balloon(radius, mass_helium, mass_balloon, mass_payload))
+
+# Synthetic pages in the psl.noaa.gov profile format (not downloaded) for the parser benchmark
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Best wall time (s) of `repeat` calls
+def best_time(function, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def bench_fit(repeat):
+    return {'atmosphere_fit_s': best_time(lambda: Atmosphere(RECORDED_SOUNDING), repeat),
+            'atmosphere_table_s': best_time(lambda: AtmosphereTable(Atmosphere(RECORDED_SOUNDING)), repeat),
+            'atmosphere_field_s': best_time(lambda: AtmosphereField(recorded_soundings()), repeat)}
+
+# Per-call cost of the physics functions at a scalar height
+def bench_calls(calls):
+    model = flight_model()
+    atmosphere = model.atmosphere
+    table = model.table
+    heights = np.random.default_rng(0).uniform(0, 30000, calls)
+    results = {}
+    for name, function in [('bouyant_force', model.bouyant_force),
+                           ('predict_air_density', model.predict_air_density),
+                           ('balloon_volume_at_height', model.balloon_volume_at_height),
+                           ('predict_wind_speed', model.predict_wind_speed),
+                           ('wind_velocity', atmosphere.wind_velocity),
+                           ('table_terminal_rise_velocity', table.terminal_rise_velocity)]:
+        start = time.perf_counter()
+        for h in heights:
+            function(h)
+        results[f'{name}_us_per_call'] = (time.perf_counter() - start) / calls * 1e6
+    return results
+
+def bench_single(steps):
+    model = flight_model()
+    # Build the field before timing so only the steps are measured
+    model.field
+    start = time.perf_counter()
+    model.plot_trajectory(output_path=None, total_time=steps)
+    elapsed = time.perf_counter() - start
+    table = flight_model(hours=(0,)).table
+    start = time.perf_counter()
+    times, states, events = integrate_flight(table, 86400)
+    return {'plot_trajectory_steps_per_s': steps / elapsed,
+            'adaptive_trajectory_s': time.perf_counter() - start,
+            'adaptive_trajectory_steps': len(times)}
+
+def bench_ensemble(member_counts, steps):
+    field = AtmosphereField(recorded_soundings())
+    results = {}
+    for members in member_counts:
+        ensemble = Ensemble(field, radius, np.linspace(0.014, 0.02, members), mass_balloon, mass_payload)
+        start = time.perf_counter()
+        for i in range(steps):
+            ensemble.step(1, i)
+        elapsed = time.perf_counter() - start
+        results[str(members)] = {'steps_per_s': steps / elapsed, 'member_steps_per_s': steps * members / elapsed}
+    return results
+
+# Peak traced memory of a full run of plot_trajectory, recorded in memory
+def bench_memory(total_time):
+    model = flight_model()
+    tracemalloc.start()
+    model.plot_trajectory(output_path=None, total_time=total_time)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'total_time_s': total_time, 'peak_memory_mb': peak / 2**20}
+
+# The parsing retrieve_table used to do: BeautifulSoup, back to a string, two regexes, nested float lists,
+# then one list walk per column like Atmosphere did
+def legacy_parse(content):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(content, 'html.parser')
+    table = str(soup.find('table'))
+    rows = re.findall(r'<tr>(.*?)</tr>', table)
+    header = re.findall(r'<td>(.*?)</td>', rows[0])
+    data = []
+    for row in rows[1:]:
+        cols = re.findall(r'<td align="right">(.*?)</td>', row)
+        data.append([float(col.strip()) for col in cols])
+    columns = [np.array([data[i][k] for i in range(len(data))]) for k in range(len(data[0]))]
+    return header, columns
+
+# Per-page parse time of the synthetic fixtures, old parser against parse_sounding
+def bench_parse(repeat):
+    pages = [open(path, 'rb').read() for path in sorted(glob.glob(os.path.join(FIXTURES, '*.html')))]
+    legacy = best_time(lambda: [legacy_parse(page) for page in pages], repeat) / len(pages)
+    single_pass = best_time(lambda: [parse_sounding(page) for page in pages], repeat) / len(pages)
+    return {'pages': len(pages), 'legacy_us_per_page': legacy * 1e6, 'parse_sounding_us_per_page': single_pass * 1e6,
+            'speedup': legacy / single_pass}
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-o', '--output', default='benchmark_results.json', help='JSON file to write results to')
+    parser.add_argument('--quick', action='store_true', help='Shorter runs for a fast smoke check')
+    args = parser.parse_args()
+
+    quick = args.quick
+    results = {
+        'revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'quick': quick,
+        'fit': bench_fit(repeat=3 if quick else 10),
+        'parse': bench_parse(repeat=20 if quick else 200),
+        'calls': bench_calls(calls=1000 if quick else 20000),
+        'single': bench_single(steps=3600 if quick else 86400),
+        'ensemble': bench_ensemble([1, 10, 100, 1000, 10000], steps=20 if quick else 200),
+        'memory': bench_memory(total_time=3600 if quick else 86400),
+    }
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,144 @@
+import threading
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from trajectory import TrajectoryRecorder
+
+EARTH_RADIUS = 6371000  # m
+GRID_SPACING = 2.5  # degrees, spacing of the NCEP/NCAR reanalysis grid
+
+# Position x metres east and y metres north of (latitude, longitude), on a locally flat earth
+def offset_to_latlon(latitude, longitude, x, y):
+    lat = latitude + np.degrees(np.asarray(y) / EARTH_RADIUS)
+    lon = longitude + np.degrees(np.asarray(x) / (EARTH_RADIUS * np.cos(np.radians(lat))))
+    lon = (lon + 180) % 360 - 180
+    return lat, lon
+
+# Reanalysis grid point nearest to (latitude, longitude)
+def grid_cell(latitude, longitude, spacing=GRID_SPACING):
+    lat = round(latitude / spacing) * spacing
+    lon = (round(longitude / spacing) * spacing + 180) % 360 - 180
+    return (max(-90.0, min(90.0, lat)), lon)
+
+def neighbour_cells(cell, spacing=GRID_SPACING):
+    return [grid_cell(cell[0] + i * spacing, cell[1] + j * spacing, spacing)
+            for i in (-1, 0, 1) for j in (-1, 0, 1) if i or j]
+
+# In-memory LRU of per-cell profiles, filled by loader(cell) on a background thread pool
+# lookup() never blocks: it returns None while a cell is still being fetched (or if its fetch failed)
+class ProfileCache:
+    def __init__(self, loader, capacity=32, workers=4):
+        self.loader = loader
+        self.capacity = capacity
+        self.profiles = OrderedDict()
+        self.pending = {}
+        self.failed = set()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    def put(self, cell, profile):
+        with self.lock:
+            self.profiles[cell] = profile
+            self.profiles.move_to_end(cell)
+            while len(self.profiles) > self.capacity:
+                self.profiles.popitem(last=False)
+
+    # Start fetching a cell in the background unless it is cached, already on its way or known to fail
+    def request(self, cell):
+        with self.lock:
+            if cell in self.profiles or cell in self.pending or cell in self.failed:
+                return
+            self.pending[cell] = self.executor.submit(self.loader, cell)
+
+    def prefetch_neighbours(self, cell, spacing=GRID_SPACING):
+        for neighbour in neighbour_cells(cell, spacing):
+            self.request(neighbour)
+
+    def _collect(self, cell):
+        with self.lock:
+            future = self.pending.pop(cell, None)
+            if future is None:
+                return self.profiles.get(cell)
+        try:
+            profile = future.result()
+        except Exception as e:
+            print(f"Error: Unable to load profile for grid cell {cell}: {e}")
+            with self.lock:
+                self.failed.add(cell)
+            return None
+        self.put(cell, profile)
+        return profile
+
+    def lookup(self, cell):
+        with self.lock:
+            if cell in self.profiles:
+                self.profiles.move_to_end(cell)
+                return self.profiles[cell]
+            future = self.pending.get(cell)
+        if future is None:
+            self.request(cell)
+            return None
+        if not future.done():
+            return None
+        return self._collect(cell)
+
+    # Blocking version of lookup, for callers that must have the profile
+    def get(self, cell):
+        self.request(cell)
+        with self.lock:
+            if cell in self.profiles:
+                return self.profiles[cell]
+            future = self.pending.get(cell)
+        if future is None:
+            return None
+        future.exception()
+        return self._collect(cell)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+# Propagate a FlightModel's balloon like plot_trajectory, but follow it across the reanalysis grid:
+# every step the position is converted to latitude/longitude, and once the balloon is over a new grid
+# cell the atmosphere switches to that cell's soundings (same day and hours) as soon as they are loaded.
+# Neighbouring cells are prefetched in the background, so the flight never waits on the network.
+# Returns the trajectory records and the matching latitude and longitude arrays
+def drift_trajectory(flight, total_time=86400, time_step=1, profiles=None, output_stride=1, output_path=None):
+    from model import FlightModel
+
+    def load(cell):
+        return FlightModel(flight.year, flight.month, flight.day, cell[0], cell[1], flight.hours,
+                           balloon=flight.balloon, cache_dir=flight.cache_dir).field
+    own_profiles = profiles is None
+    if own_profiles:
+        profiles = ProfileCache(load)
+
+    tracer = flight.balloon
+    cell = grid_cell(flight.latitude, flight.longitude)
+    field = flight.field
+    profiles.put(cell, field)
+    profiles.prefetch_neighbours(cell)
+
+    n_steps = total_time // time_step
+    recorder = TrajectoryRecorder(n_steps, stride=output_stride, path=output_path)
+    for i in range(n_steps):
+        elapsed_time = i * time_step
+        lat, lon = offset_to_latlon(flight.latitude, flight.longitude, tracer.x, tracer.y)
+        current = grid_cell(lat, lon)
+        if current != cell:
+            profile = profiles.lookup(current)
+            if profile is not None:
+                field = profile
+                cell = current
+                profiles.prefetch_neighbours(cell)
+        # Same kinematic step as FlightModel.plot_trajectory
+        u, v, terminal_rise_velocity = field.velocity(tracer.z, elapsed_time)
+        tracer.x += u * time_step
+        tracer.y += v * time_step
+        tracer.z += terminal_rise_velocity * time_step
+        recorder.record(i, elapsed_time, tracer.x, tracer.y, tracer.z, u, v, terminal_rise_velocity)
+
+    if own_profiles:
+        profiles.close()
+    records = recorder.close()
+    lat, lon = offset_to_latlon(flight.latitude, flight.longitude, records['x'], records['y'])
+    return records, lat, lon
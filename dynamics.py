@@ -0,0 +1,185 @@
+import numpy as np
+from atmosphere import MOLAR_MASS_HELIUM, GAS_CONSTANT, GRAVITY, DRAG_COEFFICIENT_SPHERE
+from trajectory import TrajectoryRecorder
+from profiling import profiled
+
+# Full force model of balloon.py (buoyancy, gravity and quadratic drag against the air-relative velocity)
+# for N balloons at once, written so that a step allocates nothing:
+# the state lives in one preallocated (6, N) array whose rows x, y, z, vx, vy, vz are updated in place,
+# and every intermediate goes into scratch buffers made once in __init__.
+# The atmosphere comes from an AtmosphereTable, the wind is sampled onto the same altitude grid.
+# Drag is applied semi-implicitly (v_new = (v + dt * (F / m + k w)) / (1 + dt k)), which keeps 1 s steps
+# stable; an explicit update overshoots once drag is strong enough to reach terminal velocity within a step
+class DragIntegrator:
+    def __init__(self, table, radius, mass_helium, mass_balloon, mass_payload=0, drag_coefficient=DRAG_COEFFICIENT_SPHERE,
+                 popping_pressure_difference=None):
+        self.table = table
+        self.popping_pressure_difference = popping_pressure_difference
+        params = np.broadcast_arrays(*[np.atleast_1d(np.asarray(value, dtype=float))
+                                       for value in (radius, mass_helium, mass_balloon, mass_payload, drag_coefficient)])
+        radius, mass_helium, mass_balloon, mass_payload, drag_coefficient = [param.copy() for param in params]
+        self.size = n = len(radius)
+
+        # Per-member constants
+        self.gas_term = mass_helium / MOLAR_MASS_HELIUM * GAS_CONSTANT  # n R, volume = n R T / P
+        self.full_volume = 4/3 * np.pi * radius**3
+        self.helium_weight = GRAVITY * mass_helium
+        self.weight = GRAVITY * mass_balloon + GRAVITY * mass_payload
+        self.total_mass = mass_helium + mass_balloon + mass_payload
+        self.drag_factor = 0.5 * drag_coefficient * np.pi * radius**2
+
+        # Atmosphere on the table grid
+        self.resolution = table.resolution
+        self.last_index = table.last_index
+        self.pressure = table.pressure
+        self.temperature = table.temperature
+        self.air_density = table.air_density
+        self.wind_u, self.wind_v = table.wind.wind_velocity(table.heights)
+
+        # State, balloons start at rest 1 m above the ground like Balloon
+        self.state = np.zeros((6, n))
+        self.state[2] = 1
+        self.x, self.y, self.z, self.vx, self.vy, self.vz = self.state
+        self.burst = np.zeros(n, dtype=bool)
+        self.burst_time = np.full(n, np.nan)
+
+        # Scratch buffers reused every step
+        self._position = np.empty(n)
+        self._index = np.empty(n, dtype=np.intp)
+        self._next_index = np.empty(n, dtype=np.intp)
+        self._fraction = np.empty(n)
+        self._low = np.empty(n)
+        self._high = np.empty(n)
+        self._temperature = np.empty(n)
+        self._pressure = np.empty(n)
+        self._density = np.empty(n)
+        self._u = np.empty(n)
+        self._v = np.empty(n)
+        self._volume = np.empty(n)
+        self._lift = np.empty(n)
+        self._speed = np.empty(n)
+        self._work = np.empty(n)
+        self._k = np.empty(n)
+        self._still_air = np.zeros(n)
+        self._popped = np.empty(n, dtype=bool)
+        self._intact = np.empty(n, dtype=bool)
+
+    # Build from Balloon objects (anything with radius, mass_helium, mass_balloon, mass_payload and drag_coefficient)
+    @classmethod
+    def from_balloons(cls, table, balloons, **kwargs):
+        return cls(table,
+                   [b.radius for b in balloons],
+                   [b.mass_helium for b in balloons],
+                   [b.mass_balloon for b in balloons],
+                   [b.mass_payload for b in balloons],
+                   drag_coefficient=[b.drag_coefficient for b in balloons],
+                   **kwargs)
+
+    # Grid cell and fraction of every member's height, same clamping as AtmosphereTable.interpolate
+    def _locate(self):
+        position = self._position
+        np.divide(self.z, self.resolution, out=position)
+        np.clip(position, 0, self.last_index, out=position)
+        np.floor(position, out=self._fraction)
+        np.minimum(self._fraction, self.last_index - 1, out=self._fraction)
+        self._index[...] = self._fraction
+        np.add(self._index, 1, out=self._next_index)
+        np.subtract(position, self._fraction, out=self._fraction)
+
+    def _interpolate(self, values, out):
+        np.take(values, self._index, out=self._low)
+        np.take(values, self._next_index, out=self._high)
+        np.subtract(self._high, self._low, out=self._high)
+        np.multiply(self._high, self._fraction, out=self._high)
+        np.add(self._low, self._high, out=out)
+        return out
+
+    # Net buoyancy minus weight in self._lift and the drag rate k = 0.5 Cd A rho |v - w| / m in self._k
+    @profiled('drag.forces')
+    def _forces(self):
+        self._locate()
+        self._interpolate(self.temperature, self._temperature)
+        self._interpolate(self.pressure, self._pressure)
+        self._interpolate(self.air_density, self._density)
+        self._interpolate(self.wind_u, self._u)
+        self._interpolate(self.wind_v, self._v)
+
+        # Balloon volume at height, capped at the full volume
+        volume = self._volume
+        np.multiply(self.gas_term, self._temperature, out=volume)
+        np.divide(volume, self._pressure, out=volume)
+        np.minimum(volume, self.full_volume, out=volume)
+
+        # Bouyant force g V (rho - m_He / V) less the weight of envelope and payload
+        lift = self._lift
+        np.multiply(volume, self._density, out=lift)
+        np.multiply(lift, GRAVITY, out=lift)
+        np.subtract(lift, self.helium_weight, out=lift)
+        np.subtract(lift, self.weight, out=lift)
+
+        # Speed relative to the air
+        speed, work = self._speed, self._work
+        np.subtract(self.vx, self._u, out=work)
+        np.multiply(work, work, out=speed)
+        np.subtract(self.vy, self._v, out=work)
+        np.multiply(work, work, out=work)
+        np.add(speed, work, out=speed)
+        np.multiply(self.vz, self.vz, out=work)
+        np.add(speed, work, out=speed)
+        np.sqrt(speed, out=speed)
+
+        k = self._k
+        np.multiply(self.drag_factor, self._density, out=k)
+        np.multiply(k, speed, out=k)
+        np.divide(k, self.total_mass, out=k)
+
+    # One velocity component: v_new = (v + dt * (forcing + k * wind)) / (1 + dt * k), then x += v_new * dt
+    def _advance(self, position, velocity, wind, forcing, time_step):
+        work = self._work
+        np.multiply(self._k, wind, out=work)
+        if forcing is not None:
+            np.add(work, forcing, out=work)
+        np.multiply(work, time_step, out=work)
+        np.add(velocity, work, out=velocity)
+        np.multiply(self._k, time_step, out=work)
+        np.add(work, 1, out=work)
+        np.divide(velocity, work, out=velocity)
+        np.copyto(velocity, 0, where=self.burst)
+        np.multiply(velocity, time_step, out=work)
+        np.add(position, work, out=position)
+
+    # Advance every balloon by one time step
+    def step(self, time_step, elapsed_time=0):
+        self._forces()
+        np.divide(self._lift, self.total_mass, out=self._lift)
+        self._advance(self.x, self.vx, self._u, None, time_step)
+        self._advance(self.y, self.vy, self._v, None, time_step)
+        self._advance(self.z, self.vz, self._still_air, self._lift, time_step)
+        # The ground stops the fall
+        np.maximum(self.z, 0, out=self.z)
+
+        if self.popping_pressure_difference is not None:
+            # Superpressure n R T / V_full - P at the new height
+            self._locate()
+            self._interpolate(self.temperature, self._temperature)
+            self._interpolate(self.pressure, self._pressure)
+            work = self._work
+            np.multiply(self.gas_term, self._temperature, out=work)
+            np.divide(work, self.full_volume, out=work)
+            np.subtract(work, self._pressure, out=work)
+            np.greater(work, self.popping_pressure_difference, out=self._popped)
+            np.logical_not(self.burst, out=self._intact)
+            np.logical_and(self._popped, self._intact, out=self._popped)
+            np.copyto(self.burst_time, elapsed_time + time_step, where=self._popped)
+            np.logical_or(self.burst, self._popped, out=self.burst)
+
+    # Run the whole flight and return times and (records, members) arrays of x, y and z, like Ensemble.run
+    def run(self, total_time=86400, time_step=1, record_every=1, path=None):
+        n_steps = int(total_time // time_step)
+        recorder = TrajectoryRecorder(n_steps, members=self.size, stride=record_every, path=path)
+        for i in range(n_steps):
+            elapsed_time = i * time_step
+            self.step(time_step, elapsed_time)
+            recorder.record(i, elapsed_time, self.x, self.y, self.z, self.vx, self.vy, self.vz)
+        records = recorder.close()
+        return records['t'][:, 0], records['x'], records['y'], records['z']
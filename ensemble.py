@@ -0,0 +1,119 @@
+import numpy as np
+from atmosphere import MOLAR_MASS_HELIUM, GAS_CONSTANT, GRAVITY, DRAG_COEFFICIENT_SPHERE
+from trajectory import TrajectoryRecorder
+from profiling import profiled
+
+# Holds the state of N balloons as numpy arrays and moves all of them forward together
+# Every balloon parameter may be a scalar (shared by all members) or an array with one value per member
+# wind_error_u / wind_error_v are per-member offsets (m/s) added to the forecast wind
+# With popping_pressure_difference set, members whose superpressure exceeds it burst and stop moving
+class Ensemble:
+    def __init__(self, atmosphere, radius, mass_helium, mass_balloon, mass_payload, launch_time=0, drag_coefficient=DRAG_COEFFICIENT_SPHERE,
+                 wind_error_u=0, wind_error_v=0, popping_pressure_difference=None):
+        self.atmosphere = atmosphere
+        self.popping_pressure_difference = popping_pressure_difference
+        params = np.broadcast_arrays(*[np.atleast_1d(np.asarray(value, dtype=float))
+                                       for value in (radius, mass_helium, mass_balloon, mass_payload, launch_time, drag_coefficient,
+                                                     wind_error_u, wind_error_v)])
+        (self.radius, self.mass_helium, self.mass_balloon, self.mass_payload,
+         self.launch_time, self.drag_coefficient, self.wind_error_u, self.wind_error_v) = [param.copy() for param in params]
+        self.size = len(self.radius)
+        self.moles_helium = self.mass_helium / MOLAR_MASS_HELIUM
+        self.cross_sectional_area = np.pi * self.radius**2
+        self.full_volume = 4/3 * np.pi * self.radius**3
+        self.x = np.zeros(self.size)
+        self.y = np.zeros(self.size)
+        self.z = np.ones(self.size)
+        self.vx = np.zeros(self.size)
+        self.vy = np.zeros(self.size)
+        self.vz = np.zeros(self.size)
+        self.burst = np.zeros(self.size, dtype=bool)
+        self.burst_time = np.full(self.size, np.nan)
+
+    # Build an ensemble from Balloon objects (anything with radius, mass_helium, mass_balloon and mass_payload)
+    @classmethod
+    def from_balloons(cls, atmosphere, balloons, launch_time=0, **kwargs):
+        return cls(atmosphere,
+                   [b.radius for b in balloons],
+                   [b.mass_helium for b in balloons],
+                   [b.mass_balloon for b in balloons],
+                   [b.mass_payload for b in balloons],
+                   launch_time=launch_time,
+                   drag_coefficient=[b.drag_coefficient for b in balloons],
+                   **kwargs)
+
+    # Atmosphere seen at elapsed time t, time-dependent fields (AtmosphereField) are frozen at t
+    def atmosphere_at(self, t=0):
+        if hasattr(self.atmosphere, 'at_time'):
+            return self.atmosphere.at_time(t)
+        return self.atmosphere
+
+    # Find balloon volume at height for every member
+    def balloon_volume_at_height(self, h, t=0):
+        pressure, temperature = self.atmosphere_at(t).conditions(h, wind=False)[:2]
+        return self._volume(pressure, temperature)
+
+    def bouyant_force(self, h, t=0):
+        pressure, temperature, air_density = self.atmosphere_at(t).conditions(h, wind=False)
+        return self._bouyant_force(pressure, temperature, air_density)
+
+    def gravitational_force(self):
+        return GRAVITY * self.mass_balloon + GRAVITY * self.mass_payload
+
+    # Terminal rise velocity, zero for members that are not positively buoyant
+    def terminal_rise_velocity(self, h, t=0):
+        pressure, temperature, air_density = self.atmosphere_at(t).conditions(h, wind=False)
+        return self._rise_velocity(pressure, temperature, air_density)
+
+    # Pressure of the helium above the surrounding air once the envelope is fully stretched
+    def superpressure(self, h, t=0):
+        pressure, temperature = self.atmosphere_at(t).conditions(h, wind=False)[:2]
+        return self._superpressure(pressure, temperature)
+
+    # The same physics from atmospheric conditions already looked up, so a step samples the atmosphere once per height
+    def _volume(self, pressure, temperature):
+        return np.minimum(self.moles_helium * GAS_CONSTANT * temperature / pressure, self.full_volume)
+
+    def _bouyant_force(self, pressure, temperature, air_density):
+        volume = self._volume(pressure, temperature)
+        return GRAVITY * volume * (air_density - self.mass_helium / volume)
+
+    @profiled('ensemble.rise_velocity')
+    def _rise_velocity(self, pressure, temperature, air_density):
+        excess = self._bouyant_force(pressure, temperature, air_density) - self.gravitational_force()
+        return np.sqrt(np.maximum(excess, 0) / (self.drag_coefficient * self.cross_sectional_area))
+
+    @profiled('ensemble.superpressure')
+    def _superpressure(self, pressure, temperature):
+        return self.moles_helium * GAS_CONSTANT * temperature / self.full_volume - pressure
+
+    # Advance every launched member that has not burst by one time step
+    def step(self, time_step, elapsed_time=0):
+        atmosphere = self.atmosphere_at(elapsed_time)
+        active = (self.launch_time <= elapsed_time) & ~self.burst
+        pressure, temperature, air_density, u, v = atmosphere.conditions(self.z)
+        rise = self._rise_velocity(pressure, temperature, air_density)
+        self.vx = np.where(active, u + self.wind_error_u, 0)
+        self.vy = np.where(active, v + self.wind_error_v, 0)
+        self.vz = np.where(active, rise, 0)
+        self.x += self.vx * time_step
+        self.y += self.vy * time_step
+        self.z += self.vz * time_step
+        if self.popping_pressure_difference is not None:
+            pressure, temperature, _ = atmosphere.conditions(self.z, wind=False)
+            popped = active & (self._superpressure(pressure, temperature) > self.popping_pressure_difference)
+            self.burst |= popped
+            self.burst_time[popped] = elapsed_time + time_step
+
+    # Run the whole flight and return times and (records, members) arrays of x, y and z
+    # Only every record_every-th step is kept to bound memory for large ensembles
+    # With a path the records are also kept in a memory-mapped .npy file (see trajectory.TrajectoryRecorder)
+    def run(self, total_time=86400, time_step=1, record_every=1, path=None):
+        n_steps = int(total_time // time_step)
+        recorder = TrajectoryRecorder(n_steps, members=self.size, stride=record_every, path=path)
+        for i in range(n_steps):
+            elapsed_time = i * time_step
+            self.step(time_step, elapsed_time)
+            recorder.record(i, elapsed_time, self.x, self.y, self.z, self.vx, self.vy, self.vz)
+        records = recorder.close()
+        return records['t'][:, 0], records['x'], records['y'], records['z']
@@ -0,0 +1,63 @@
+import io
+import time
+import hashlib
+import numpy as np
+from atmosphere import Atmosphere, sounding_array
+from sqlite_cache import SqliteCache
+
+# Bump when the fitting procedure changes so old entries stop matching
+FIT_VERSION = 1
+
+# Hash of the sounding rows plus any settings that change what is derived from them
+def profile_key(soundings, *settings):
+    digest = hashlib.sha1()
+    for data in soundings:
+        # Rows and SOUNDING_DTYPE arrays of the same sounding hash alike
+        digest.update(np.nan_to_num(sounding_array(data).view(float), nan=-999.0).tobytes())
+    digest.update(repr(settings).encode())
+    return digest.hexdigest()[:16]
+
+def _pack(parameters):
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **parameters)
+    return buffer.getvalue()
+
+def _unpack(blob):
+    with np.load(io.BytesIO(blob)) as stored:
+        return dict(stored)
+
+# Fitted atmosphere parameters (pressure popt, temperature and humidity coefficients, humidity cutoff index and
+# wind segment tables) stored in one SQLite file, keyed by the sounding rows and fit settings
+# When the stored blobs grow past max_bytes the least recently used entries are evicted (see SqliteCache)
+class FitCache(SqliteCache):
+    table = 'fits'
+
+    def __init__(self, path, max_bytes=64 * 1024 * 1024):
+        super().__init__(path, 'key TEXT PRIMARY KEY, parameters BLOB, size INTEGER, last_used REAL', max_bytes)
+
+    @staticmethod
+    def key(data, temperature_degree=4, humidity_degree=3):
+        return profile_key([data], 'fit', FIT_VERSION, temperature_degree, humidity_degree)
+
+    def get(self, key):
+        with self._connect() as connection:
+            row = connection.execute('SELECT parameters FROM fits WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            connection.execute('UPDATE fits SET last_used = ? WHERE key = ?', (time.time(), key))
+        return _unpack(row[0])
+
+    def put(self, key, parameters):
+        blob = _pack(parameters)
+        with self._connect() as connection:
+            connection.execute('INSERT OR REPLACE INTO fits VALUES (?, ?, ?, ?)', (key, blob, len(blob), time.time()))
+        self.evict()
+
+    # Atmosphere for a sounding, fitting it only if this sounding and these settings were never fitted before
+    def atmosphere(self, data, temperature_degree=4, humidity_degree=3):
+        key = self.key(data, temperature_degree, humidity_degree)
+        fit = self.get(key)
+        atmosphere = Atmosphere(data, temperature_degree, humidity_degree, fit=fit)
+        if fit is None:
+            self.put(key, atmosphere.fit_parameters())
+        return atmosphere
@@ -2,8 +2,7 @@ import tkinter as tk
 from tkinter import ttk
 from datetime import datetime
 import threading
-import requests
-from bs4 import BeautifulSoup
+from ncep_scraper import retrieve_sounding, sounding_rows
 
 # Define the temporal coverage
 start_date = datetime(1948, 1, 1)
@@ -53,45 +52,14 @@ def validate_date(year, month, day):
         return False
 
 # Function to retrieve table data
+# Goes through ncep_scraper, so a sounding requested before comes from the local cache instead of the network
+# Returns the header and data rows as text, ready for display_table_in_gui
 def retrieve_table(year, month, day, hour, latitude, longitude):
-    url = "https://psl.noaa.gov/cgi-bin/profile/makeplot.pl"
-    params = {
-        "maintype": 1,
-        "var": "air",
-        "level": 100,
-        "datatype": "reanalysis",
-        "lat1": latitude,
-        "lon1": longitude,
-        "yr1": year,
-        "mon1": month,
-        "day1": day,
-        "hr1": hour,
-        "yr2": "",
-        "mon2": 1,
-        "day2": 1,
-        "hr2": 0,
-        "anom": 0,
-        "low": "",
-        "high": "",
-        "cint": "",
-        "lineson": 0,
-        "aspectratio": 1,
-        "lat2": "",
-        "lon2": "",
-        "submit": "Create+Plot%2FGet+Data"
-    }
-    
-    try:
-        response = requests.get(url, params=params)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.content, 'html.parser')
-            table = soup.find('table')
-            print(table)
-            return table
-        else:
-            return None
-    except requests.RequestException:
+    sounding = retrieve_sounding(year, month, day, hour, latitude, longitude)
+    if sounding is None:
         return None
+    header, data = sounding
+    return [header] + [[str(value) for value in row] for row in sounding_rows(data)]
 
 # Function to handle form submission
 def submit_form():
@@ -140,16 +108,8 @@ def display_table_in_gui(table):
     table_container = ttk.Frame(table_frame)
     table_container.pack(fill="both", expand=True)
     
-    # Parse table rows and columns
-    rows = table.find_all('tr')
-    data = []
-    for row in rows:
-        cols = row.find_all('td')
-        cols = [col.text.strip() for col in cols]
-        data.append(cols)
-    
     # Display table in GUI
-    for i, row in enumerate(data):
+    for i, row in enumerate(table):
         for j, col in enumerate(row):
             label = ttk.Label(table_container, text=col, borderwidth=1, relief="solid")
             label.grid(row=i, column=j, sticky="nsew", padx=1, pady=1)
@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import requests
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+# One HTTP layer for every scraper: a keep-alive session (connection pool) per host, default
+# connect/read timeouts and exponential-backoff retries
+# Idempotent methods (GET, HEAD, ...) are retried on connection errors, timeouts and 5xx answers. Other methods
+# (POST logins, download orders) are only retried when the connection could not be opened, since after a read
+# timeout or a 5xx the server may already have acted on the request; pass idempotent=True to retry them fully
+# Use the module-level get/post like requests.get/requests.post; they raise the usual requests exceptions
+# once the retries are used up, and a 5xx that survives every retry is returned as the final response
+
+DEFAULT_TIMEOUT = (5, 60)  # seconds to connect, seconds between bytes read
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5  # seconds before the first retry, doubled for every further one
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+
+# Cassettes: with HTTP_CASSETTE set to a directory every request is replayed from it, or with
+# HTTP_CASSETTE_MODE=record sent for real and recorded there (see HttpClient.record and HttpClient.replay)
+# Only requests that reach this client are recorded: ncep_scraper skips its sounding cache while recording
+# so cached soundings are requested again, and reads the cache as usual when replaying
+HTTP_CASSETTE = os.environ.get('HTTP_CASSETTE')
+HTTP_CASSETTE_MODE = os.environ.get('HTTP_CASSETTE_MODE', 'replay')
+
+# Headers that describe the body on the wire, not the decoded body a cassette stores
+_WIRE_HEADERS = {'content-encoding', 'transfer-encoding', 'content-length', 'set-cookie'}
+
+# Raised in replay mode for a request the cassette has no answer for
+# It is a ConnectionError, so callers handle it like the network being down
+class CassetteMiss(requests.ConnectionError):
+    pass
+
+# Request/response pairs stored in a directory, two files per request: <key>.json (status, headers, url)
+# and <key>.body (the decoded body). The key hashes the method, the full URL with its query and the body,
+# not the headers, so requests only differing in tokens share a recording
+# Cassettes of authenticated APIs hold whatever the server answered (API keys from a login included), keep them private
+class Cassette:
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(prepared):
+        body = prepared.body or b''
+        if isinstance(body, str):
+            body = body.encode()
+        return hashlib.sha256(f'{prepared.method} {prepared.url}\n'.encode() + body).hexdigest()
+
+    def _path(self, key, extension):
+        return os.path.join(self.directory, f'{key}.{extension}')
+
+    def load(self, prepared):
+        key = self.key(prepared)
+        try:
+            with open(self._path(key, 'json')) as f:
+                meta = json.load(f)
+            with open(self._path(key, 'body'), 'rb') as f:
+                body = f.read()
+        except FileNotFoundError:
+            raise CassetteMiss(f"No recording of {prepared.method} {prepared.url} in {self.directory}") from None
+        response = requests.Response()
+        response.status_code = meta['status_code']
+        response.reason = meta['reason']
+        response.headers = CaseInsensitiveDict(meta['headers'])
+        response.encoding = meta['encoding']
+        response.url = meta['url']
+        response.request = prepared
+        response._content = body
+        return response
+
+    def save(self, prepared, response):
+        key = self.key(prepared)
+        meta = {'method': prepared.method, 'url': response.url, 'status_code': response.status_code, 'reason': response.reason,
+                'encoding': response.encoding,
+                'headers': {name: value for name, value in response.headers.items() if name.lower() not in _WIRE_HEADERS}}
+        # Body first and both files replaced atomically, so a recording is only visible once it is complete
+        for extension, content in (('body', response.content), ('json', json.dumps(meta, indent=1).encode())):
+            temporary = f'{self._path(key, extension)}.tmp{os.getpid()}.{threading.get_ident()}'
+            with open(temporary, 'wb') as f:
+                f.write(content)
+            os.replace(temporary, self._path(key, extension))
+
+class HttpClient:
+    def __init__(self, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF, pool_size=16):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.sessions = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.cassette = None
+        self.mode = None
+
+    # Send every request for real and store its final response (after retries) in the cassette directory
+    def record(self, directory):
+        self.cassette, self.mode = Cassette(directory), 'record'
+
+    # Answer every request from the cassette directory without touching the network
+    # A request that was never recorded raises CassetteMiss
+    def replay(self, directory):
+        self.cassette, self.mode = Cassette(directory), 'replay'
+
+    # Back to plain network requests
+    def live(self):
+        self.cassette, self.mode = None, None
+
+    # Pooled session for the host of url, created on first use
+    def session(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            session = self.sessions.get(host)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self.sessions[host] = session
+        return session
+
+    def _count(self, endpoint, seconds=0.0, received=0, error=False, retry=False):
+        with self.lock:
+            entry = self.counters.setdefault(endpoint, {'requests': 0, 'errors': 0, 'retries': 0, 'bytes': 0, 'seconds': 0.0})
+            entry['requests'] += 1
+            entry['errors'] += error
+            entry['retries'] += retry
+            entry['bytes'] += received
+            entry['seconds'] += seconds
+
+    # idempotent=None decides from the method (see IDEMPOTENT_METHODS)
+    def request(self, method, url, retries=None, idempotent=None, **kwargs):
+        retries = self.retries if retries is None else retries
+        idempotent = method.upper() in IDEMPOTENT_METHODS if idempotent is None else idempotent
+        kwargs.setdefault('timeout', self.timeout)
+        parts = urlsplit(url)
+        endpoint = f'{parts.scheme}://{parts.netloc}{parts.path}'
+        cassette, mode = self.cassette, self.mode
+        if cassette is not None:
+            prepared = requests.Request(method, url, params=kwargs.get('params'), data=kwargs.get('data'),
+                                        json=kwargs.get('json')).prepare()
+            if mode == 'replay':
+                start = time.perf_counter()
+                try:
+                    response = cassette.load(prepared)
+                except CassetteMiss:
+                    self._count(endpoint, time.perf_counter() - start, error=True)
+                    raise
+                self._count(endpoint, time.perf_counter() - start, len(response.content))
+                return response
+            response = self._send(method, url, endpoint, retries, idempotent, **kwargs)
+            cassette.save(prepared, response)
+            return response
+        return self._send(method, url, endpoint, retries, idempotent, **kwargs)
+
+    # True when the request failed before a connection was opened, so the server never saw it
+    @staticmethod
+    def _not_sent(error):
+        if isinstance(error, requests.ConnectTimeout):
+            return True
+        reason = error.args[0] if error.args else None
+        return isinstance(reason, MaxRetryError) and isinstance(reason.reason, NewConnectionError)
+
+    def _send(self, method, url, endpoint, retries, idempotent, **kwargs):
+        session = self.session(url)
+        for attempt in range(retries + 1):
+            start = time.perf_counter()
+            try:
+                response = session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                retry = attempt < retries and (idempotent or self._not_sent(e))
+                self._count(endpoint, time.perf_counter() - start, error=True, retry=retry)
+                if not retry:
+                    raise
+            else:
+                # Streamed bodies are not read here, count what the server announced instead
+                received = int(response.headers.get('Content-Length', 0)) if kwargs.get('stream') else len(response.content)
+                failed = response.status_code >= 500
+                retry = failed and idempotent and attempt < retries
+                self._count(endpoint, time.perf_counter() - start, received, error=failed, retry=retry)
+                if not retry:
+                    return response
+                response.close()
+            time.sleep(self.backoff * 2**attempt)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, data=None, json=None, **kwargs):
+        return self.request('POST', url, data=data, json=json, **kwargs)
+
+    # Per-endpoint counters: requests (attempts), errors, retries, bytes received and seconds spent
+    def stats(self):
+        with self.lock:
+            return {endpoint: dict(entry) for endpoint, entry in self.counters.items()}
+
+    def report(self):
+        lines = [f"{'endpoint':<60} {'requests':>9} {'errors':>7} {'retries':>8} {'bytes':>12} {'mean (ms)':>10}"]
+        for endpoint, entry in sorted(self.stats().items()):
+            lines.append(f"{endpoint:<60} {entry['requests']:>9} {entry['errors']:>7} {entry['retries']:>8} {entry['bytes']:>12} "
+                         f"{entry['seconds'] / entry['requests'] * 1000:>10.1f}")
+        return '\n'.join(lines)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+
+    def close(self):
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions.clear()
+
+client = HttpClient()
+if HTTP_CASSETTE:
+    if HTTP_CASSETTE_MODE == 'record':
+        client.record(HTTP_CASSETTE)
+    else:
+        client.replay(HTTP_CASSETTE)
+
+def get(url, **kwargs):
+    return client.get(url, **kwargs)
+
+def post(url, data=None, json=None, **kwargs):
+    return client.post(url, data=data, json=json, **kwargs)
@@ -0,0 +1,108 @@
+import numpy as np
+from scipy.integrate import solve_ivp
+
+# Adaptive-step (RK45 with error control by default) integration of one balloon through an AtmosphereTable or an
+# AtmosphereField built with that balloon. A field is looked up at launch_time + t (seconds after 00 UTC), so the
+# flight sees the same time-interpolated soundings as FlightModel.stream_trajectory
+# Three events are detected while integrating:
+#   float  - the balloon reaches the neutral buoyancy height (within float_tolerance metres)
+#   burst  - the helium superpressure exceeds popping_pressure_difference
+#   ground - the balloon comes back down to the ground
+# model='kinematic' uses the terminal rise velocity physics of model.py with state (x, y, z)
+# model='dynamic' uses the drag, bouyancy and gravity force model of balloon.py with state (x, y, z, vx, vy, vz)
+
+# Lookup with one (z, t) signature for both: tables ignore t, fields are queried at launch_time + t
+def _sampler(atmosphere, launch_time):
+    if hasattr(atmosphere, 'at_time'):
+        return lambda lookup, z, t: lookup(z, launch_time + t)
+    return lambda lookup, z, t: lookup(z)
+
+def _kinematic_rhs(table, floating, sample):
+    def rhs(t, state):
+        z = state[2]
+        u, v = sample(table.wind_velocity, z, t)
+        # Once floating the balloon drifts at constant height, which lets the step size grow freely
+        w = 0.0 if floating else sample(table.terminal_rise_velocity, z, t)
+        return [u, v, w]
+    return rhs
+
+def _dynamic_rhs(table, sample):
+    balloon = table.balloon
+    total_mass = balloon.mass_helium + balloon.mass_balloon + balloon.mass_payload
+    drag_factor = 0.5 * balloon.drag_coefficient * balloon.cross_sectional_area
+    def rhs(t, state):
+        x, y, z, vx, vy, vz = state
+        u, v = sample(table.wind_velocity, z, t)
+        rx, ry, rz = vx - u, vy - v, vz
+        speed = np.sqrt(rx * rx + ry * ry + rz * rz)
+        # Drag opposes the velocity relative to the air
+        drag = drag_factor * sample(table.predict_air_density, z, t) * speed
+        lift = sample(table.bouyant_force, z, t) - table.gravitational_force
+        return [vx, vy, vz,
+                -drag * rx / total_mass,
+                -drag * ry / total_mass,
+                (lift - drag * rz) / total_mass]
+    return rhs
+
+def _events(table, sample, neutral_height, popping_pressure_difference, float_tolerance, float_terminal):
+    def float_event(t, state):
+        return state[2] - (neutral_height - float_tolerance)
+    float_event.terminal = float_terminal
+    float_event.direction = 1
+
+    def burst_event(t, state):
+        return sample(table.superpressure_at_height, state[2], t) - popping_pressure_difference
+    burst_event.terminal = True
+    burst_event.direction = 1
+
+    def ground_event(t, state):
+        return state[2]
+    ground_event.terminal = True
+    ground_event.direction = -1
+
+    events = {'burst': burst_event, 'ground': ground_event}
+    if neutral_height is not None:
+        events['float'] = float_event
+    return events
+
+# Integrate a flight and return (times, states, events)
+# states has one row per accepted step; events maps 'float', 'burst' and 'ground' to the time they happened (or None)
+# Times are seconds since launch; launch_time only matters for an AtmosphereField, which needs neutral_height given
+def integrate_flight(table, total_time=86400, initial_state=None, model='kinematic', neutral_height=None,
+                     popping_pressure_difference=4600, float_tolerance=1.0, method='RK45', rtol=1e-6, atol=1e-3, max_step=np.inf,
+                     launch_time=0):
+    sample = _sampler(table, launch_time)
+    if neutral_height is None:
+        if not hasattr(table, 'neutral_buoyancy_height'):
+            raise ValueError("neutral_height is required when integrating through an AtmosphereField")
+        neutral_height = table.neutral_buoyancy_height()
+    if model == 'kinematic':
+        state = [0.0, 0.0, 1.0] if initial_state is None else list(initial_state)
+    elif model == 'dynamic':
+        state = [0.0, 0.0, 1.0, 0.0, 0.0, 0.0] if initial_state is None else list(initial_state)
+    else:
+        raise ValueError(f"Unknown model: {model}")
+
+    # The kinematic model stops at float and restarts with the vertical motion frozen
+    phases = [False, True] if model == 'kinematic' else [False]
+    fired = {'float': None, 'burst': None, 'ground': None}
+    all_times = []
+    all_states = []
+    start = 0.0
+    for floating in phases:
+        rhs = _kinematic_rhs(table, floating, sample) if model == 'kinematic' else _dynamic_rhs(table, sample)
+        events = _events(table, sample, None if floating else neutral_height, popping_pressure_difference,
+                         float_tolerance, float_terminal=(model == 'kinematic'))
+        names = list(events)
+        solution = solve_ivp(rhs, (start, total_time), state, method=method, events=[events[name] for name in names],
+                             rtol=rtol, atol=atol, max_step=max_step)
+        all_times.append(solution.t if not all_times else solution.t[1:])
+        all_states.append(solution.y.T if not all_states else solution.y.T[1:])
+        for name, times in zip(names, solution.t_events):
+            if len(times) and fired[name] is None:
+                fired[name] = times[0]
+        if solution.status != 1 or fired['burst'] is not None or fired['ground'] is not None:
+            break
+        start = solution.t[-1]
+        state = solution.y[:, -1]
+    return np.concatenate(all_times), np.concatenate(all_states), fired
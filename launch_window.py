@@ -0,0 +1,136 @@
+import os
+import datetime
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from drift import EARTH_RADIUS, grid_cell, offset_to_latlon
+import model
+
+# Distance (m) from (latitude, longitude) to a region (lat_min, lat_max, lon_min, lon_max), 0 inside it
+def region_distance(latitude, longitude, region):
+    lat_min, lat_max, lon_min, lon_max = region
+    latitude = np.asarray(latitude, dtype=float)
+    longitude = np.asarray(longitude, dtype=float)
+    dlat = np.maximum(lat_min - latitude, 0) + np.maximum(latitude - lat_max, 0)
+    dlon = np.maximum(lon_min - longitude, 0) + np.maximum(longitude - lon_max, 0)
+    dy = np.radians(dlat) * EARTH_RADIUS
+    dx = np.radians(dlon) * EARTH_RADIUS * np.cos(np.radians(latitude))
+    return np.hypot(dx, dy)[()]
+
+# Fly every launch hour from one site on one day and score it against the region
+# All launches share one FlightModel, so the soundings are fitted once per site and day
+# A launch is pruned (stopped early) once it is farther from the region than the strongest wind in the
+# soundings could carry it in the remaining time, or when it bursts
+def _evaluate_site(date, latitude, longitude, soundings, hours, launch_hours, region, balloon, min_altitude, total_time,
+                   time_step, output_stride, popping_pressure_difference, cache_dir, chunk_size=600):
+    flight = model.FlightModel(date.year, date.month, date.day, latitude, longitude, hours,
+                               balloon=balloon, soundings=soundings, cache_dir=cache_dir)
+    field = flight.field
+    max_wind = max(np.max(np.abs(atmosphere.wind_speed)) for atmosphere in flight.atmospheres)
+    options = []
+    for launch_hour in launch_hours:
+        launch_time = launch_hour * 3600
+        option = {'launch': datetime.datetime(date.year, date.month, date.day) + datetime.timedelta(hours=launch_hour),
+                  'latitude': latitude, 'longitude': longitude, 'time_over_region': 0.0, 'closest_approach': np.inf,
+                  'burst_time': None, 'pruned': False}
+        # Balloons that cannot leave the ground are hopeless from the start
+        if field.terminal_rise_velocity(1, launch_time) <= 0:
+            option['pruned'] = True
+            option['track'] = np.zeros(0, dtype=model.TRAJECTORY_DTYPE)
+            options.append(option)
+            continue
+
+        flight.balloon = model.Balloon(balloon.radius, balloon.mass_helium, balloon.mass_balloon, balloon.mass_payload)
+        n_steps = total_time // time_step
+        kept = []
+        step = 0
+        for chunk in flight.stream_trajectory(total_time, time_step, chunk_size=chunk_size, launch_time=launch_time):
+            if popping_pressure_difference is not None:
+                popped = np.flatnonzero(field.superpressure_at_height(chunk['z'], chunk['t']) > popping_pressure_difference)
+                if len(popped):
+                    chunk = chunk[:popped[0] + 1]
+                    option['burst_time'] = chunk['t'][-1] - launch_time
+            lat, lon = offset_to_latlon(latitude, longitude, chunk['x'], chunk['y'])
+            distance = region_distance(lat, lon, region)
+            over = (distance == 0) & (chunk['z'] >= min_altitude)
+            option['time_over_region'] += np.count_nonzero(over) * time_step
+            option['closest_approach'] = min(option['closest_approach'], distance.min())
+            kept.append(chunk[-step % output_stride::output_stride])
+            step += len(chunk)
+            if option['burst_time'] is not None:
+                break
+            remaining = (n_steps - step) * time_step
+            if distance[-1] > max_wind * remaining:
+                option['pruned'] = step < n_steps
+                break
+        track = np.concatenate(kept)
+        option['track'] = track
+        option['track_latitude'], option['track_longitude'] = offset_to_latlon(latitude, longitude, track['x'], track['y'])
+        options.append(option)
+    return options
+
+# Soundings at `hours` for every (day, site), fetched once per reanalysis grid cell on a thread pool
+# Returns {(date, grid_cell): [rows per hour]}, with None for soundings that could not be fetched
+# Without a loader the whole batch goes through ncep_scraper.retrieve_tables
+def fetch_soundings(dates, sites, hours=(0, 6, 12, 18), loader=None, workers=8):
+    keys = sorted({(date, grid_cell(latitude, longitude)) for date in dates for latitude, longitude in sites})
+    if loader is None:
+        from ncep_scraper import retrieve_tables
+        requests = [(date.year, date.month, date.day, hour, latitude, longitude)
+                    for date, (latitude, longitude) in keys for hour in hours]
+        tables = []
+        for request, table in zip(requests, retrieve_tables(requests, workers=workers)):
+            if isinstance(table, Exception):
+                print(f"Error: Unable to fetch sounding {request}: {table}")
+                table = None
+            tables.append(table)
+        return {key: tables[k * len(hours):(k + 1) * len(hours)] for k, key in enumerate(keys)}
+
+    def fetch(key):
+        date, (latitude, longitude) = key
+        return [loader(date.year, date.month, date.day, hour, latitude, longitude) for hour in hours]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return dict(zip(keys, executor.map(fetch, keys)))
+
+# Search launch days, hours and sites for the launches that float over `region` the longest
+# region is (lat_min, lat_max, lon_min, lon_max); time over the region only counts above min_altitude (m)
+# Soundings are fetched once per day and grid cell (with loader, retrieve_tables by default) and shared by
+# every launch there; sites are then evaluated in parallel over a process pool of `workers` processes
+# Returns the options ranked by time over the region, then by closest approach, each with its track
+# (TRAJECTORY_DTYPE records every output_stride steps plus track_latitude and track_longitude)
+def optimize_launch(region, dates, sites, launch_hours=(0, 6, 12, 18), hours=(0, 6, 12, 18), balloon=None,
+                    min_altitude=0, total_time=86400, time_step=1, output_stride=60,
+                    popping_pressure_difference=model.popping_pressure_difference, loader=None, workers=None,
+                    fetch_workers=8, cache_dir=model.CACHE_DIR, top=None):
+    balloon = balloon or model.Balloon(model.radius, model.mass_helium, model.mass_balloon, model.mass_payload)
+    soundings = fetch_soundings(dates, sites, hours, loader, fetch_workers)
+    workers = workers or os.cpu_count()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for date in dates:
+            for latitude, longitude in sites:
+                data = soundings[(date, grid_cell(latitude, longitude))]
+                if any(rows is None or len(rows) == 0 for rows in data):
+                    print(f"Error: No soundings for {date} at {latitude}, {longitude}, skipping site")
+                    continue
+                futures[(date, latitude, longitude)] = executor.submit(
+                    _evaluate_site, date, latitude, longitude, data, list(hours), list(launch_hours), region, balloon,
+                    min_altitude, total_time, time_step, output_stride, popping_pressure_difference, cache_dir)
+        options = []
+        for (date, latitude, longitude), future in futures.items():
+            try:
+                options.extend(future.result())
+            except Exception as e:
+                print(f"Error: Evaluating {date} at {latitude}, {longitude} failed, skipping site: {e}")
+
+    options.sort(key=lambda option: (-option['time_over_region'], option['closest_approach']))
+    return options[:top] if top else options
+
+if __name__ == '__main__':
+    # Where to launch over the three days from 2024-07-16 to float over western Idaho
+    region = (43, 46, -117, -115)
+    dates = [datetime.date(2024, 7, 16) + datetime.timedelta(days=k) for k in range(3)]
+    sites = [(45, -125), (45, -122.5), (42.5, -122.5), (47.5, -122.5)]
+    for option in optimize_launch(region, dates, sites, top=5):
+        print(f"{option['launch']:%Y-%m-%d %H}Z from {option['latitude']}, {option['longitude']}: "
+              f"{option['time_over_region'] / 3600:.1f} h over region, closest {option['closest_approach'] / 1000:.0f} km")
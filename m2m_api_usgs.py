@@ -1,4 +1,4 @@
-import requests
+import http_client
 import json
 import os
 
@@ -15,7 +15,7 @@ BBOX = [44, -124, 45, -123]  # Bounding box for search
 
 def authenticate(username, password):
     print("Authenticating...")
-    response = requests.post(M2M_URL + 'login', json={'username': username, 'password': password})
+    response = http_client.post(M2M_URL + 'login', json={'username': username, 'password': password})
     data = response.json()
     if data['errorCode']:
         print(f"Error during authentication: {data['errorMessage']}")
@@ -34,7 +34,7 @@ def search_srtm_data(api_key, bbox):
             'upperRight': {'latitude': bbox[3], 'longitude': bbox[2]}
         }
     }
-    response = requests.post(M2M_URL + 'scene-search', headers=headers, json=payload)
+    response = http_client.post(M2M_URL + 'scene-search', headers=headers, json=payload)
     data = response.json()
     if data['errorCode']:
         print(f"Error during search: {data['errorMessage']}")
@@ -45,7 +45,7 @@ def search_srtm_data(api_key, bbox):
 def get_available_products(api_key, dataset_name):
     print("Getting available products...")
     headers = {'X-Auth-Token': api_key}
-    response = requests.get(M2M_URL + f'datasets/{dataset_name}/products', headers=headers)
+    response = http_client.get(M2M_URL + f'datasets/{dataset_name}/products', headers=headers)
     
     print("Response status code:", response.status_code)
     print("Response content:", response.content)  # Print raw response for debugging
@@ -69,7 +69,7 @@ def request_download_urls(api_key, granule_ids, product_id):
     headers = {'X-Auth-Token': api_key}
     downloads = [{'label': granule_id, 'entityId': granule_id, 'productId': product_id} for granule_id in granule_ids]
     payload = {'downloads': downloads, 'downloadApplication': 'EE'}
-    response = requests.post(M2M_URL + 'download-request', headers=headers, json=payload)
+    response = http_client.post(M2M_URL + 'download-request', headers=headers, json=payload)
     data = response.json()
     if data['errorCode']:
         print(f"Error requesting download URLs: {data['errorMessage']}")
@@ -86,7 +86,7 @@ def download_files(api_key, download_requests, save_directory):
         if download_url:
             local_filename = os.path.join(save_directory, download_url.split('/')[-1])
             print(f"Downloading {local_filename} ...")
-            response = requests.get(download_url, stream=True)
+            response = http_client.get(download_url, stream=True)
             with open(local_filename, 'wb') as f:
                 for chunk in response.iter_content(chunk_size=8192):
                     f.write(chunk)
@@ -128,7 +128,7 @@ def main():
         print("No granules found")
 
     # Logout
-    requests.post(M2M_URL + 'logout', headers={'X-Auth-Token': api_key})
+    http_client.post(M2M_URL + 'logout', headers={'X-Auth-Token': api_key})
 
 if __name__ == "__main__":
     main()
@@ -1,25 +1,25 @@
+import os
 import numpy as np
-from scipy.optimize import curve_fit, fsolve
-import matplotlib.pyplot as plt
-from ncep_scraper import retrieve_table
-import math
-from sklearn.preprocessing import StandardScaler
-import tensorflow as tf
-
-
-MOLAR_MASS_HELIUM = 4.002602 / 1000  # kg / mol
-GAS_CONSTANT = 8.314  # (m^3 Pa) / (K mol)
-MOLAR_MASS_DRY_AIR = 28.96 / 1000 # kg / mol
-MOLAR_MASS_WATER_VAPOR = 18.02 / 1000  # kg / mol
+from atmosphere import (Atmosphere, AtmosphereTable, AtmosphereField, molar_mass_humid_air, exponential_model, float_altitude_map,
+                        MOLAR_MASS_HELIUM, GAS_CONSTANT, MOLAR_MASS_DRY_AIR, MOLAR_MASS_WATER_VAPOR, GRAVITY,
+                        DRAG_COEFFICIENT_SPHERE)
+from trajectory import TRAJECTORY_DTYPE, TrajectoryRecorder, trajectory_array, lttb
+from fit_cache import FitCache, profile_key
+from profiling import profiled, stage, is_enabled, report
+
+# Importing this module has no side effects: soundings are fetched, fitted and the pressure network trained
+# only when a FlightModel needs them. scipy, tensorflow, sklearn and matplotlib are imported on first use.
+
 DENSITY_AIR = 1.225  # Density of air at sea level in kg/m^3 (approximate)
-GRAVITY = 9.81  # Acceleration due to gravity in m/s^2
-DRAG_COEFFICIENT_SPHERE = 0.47  # Drag coefficient for a sphere
 radius = 0.42  # m
 popping_pressure_difference = 4600  # Pa
 mass_helium = 15 / 1000  # kg
 mass_balloon = 47 / 1000 # kg
 mass_payload = 0 / 1000 # kg
 
+# Fitted parameters (fits.sqlite) and trained network weights are stored here, keyed by the soundings they came from
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.model_cache')
+
 class Balloon:
     def __init__(self, radius, mass_helium, mass_balloon, mass_payload):
         self.radius = radius
@@ -39,391 +39,407 @@ class Balloon:
         self.vy = 0
         self.vz = 0
 
-        
-
-tracer = Balloon(radius, mass_helium, mass_balloon, mass_payload)
-
-
-# # Read in data in this format
-
-# # Data provided
-data = retrieve_table(2024, 7, 16, 0, 45, -125)
-data1 = retrieve_table(2024, 7, 16, 6, 45, -125)
-data2 = retrieve_table(2024, 7, 16, 12, 45, -125)
-data3 = retrieve_table(2024, 7, 16, 18, 45, -125)
-
-# Create numpy arrays from the data above
-height = np.array([data[i][1] for i in range(len(data))])
-pressure = np.array([(data[i][0] * 100) for i in range(len(data))]) # convert to Pa from mB
-temperature = np.array([data[i][2] for i in range(len(data))])
-specific_humidity = np.array([data[i][3] if data[i][3] != -999.0 else 0 for i in range(len(data))])
-wind_speed = np.array([data[i][5] for i in range(len(data))])
-wind_direction = np.array([data[i][6] for i in range(len(data))])
-
-height1 = np.array([data1[i][1] for i in range(len(data1))])
-height2 = np.array([data2[i][1] for i in range(len(data2))])
-height3 = np.array([data3[i][1] for i in range(len(data3))])
-
-pressure1 = np.array([(data1[i][0] * 100) for i in range(len(data1))]) # convert to Pa from mB
-pressure2 = np.array([(data2[i][0] * 100) for i in range(len(data2))]) # convert to Pa from mB
-pressure3 = np.array([(data3[i][0] * 100) for i in range(len(data3))]) # convert to Pa from mB
-
-all_heights = np.array([height, height1, height2, height3])
-all_pressures = np.array([pressure, pressure1, pressure2, pressure3])
-times = [0, 6, 12, 18]
-
-heights = np.array(all_heights).flatten()
-times = np.repeat(times, len(heights) // len(times))
-pressures = np.array(all_pressures).flatten()
-
-X = np.vstack((heights, times)).T
-y = pressures
-
-scaler_X = StandardScaler()
-scaler_y = StandardScaler()
-
-X_scaled = scaler_X.fit_transform(X)
-y_scaled = scaler_y.fit_transform(y.reshape(-1, 1))
-
-predict_pressure = tf.keras.models.Sequential([
-    tf.keras.layers.Dense(64, activation='relu', input_shape=(2,)),
-    tf.keras.layers.Dense(64, activation='relu'),
-    tf.keras.layers.Dense(1)
-])
-
-predict_pressure.compile(optimizer='adam', loss='mean_squared_error')
-
-predict_pressure.fit(X_scaled, y_scaled, epochs=20, batch_size=10, verbose=0)
-
-# Example prediction inputs
-new_heights = [10000, 10000]
-new_times = [3, 9]
-
-X_new = np.vstack((new_heights, new_times)).T
-X_new_scaled = scaler_X.transform(X_new)
-
-y_new_scaled = predict_pressure.predict(X_new_scaled)
-y_new = scaler_y.inverse_transform(y_new_scaled)
-
-print(f"Predicted pressures: {y_new.flatten()}")
-
-
-
-# Define the exponential model
-# This produces Pa
-def exponential_model(h, P0, H):
-    return P0 * np.exp(-h / H)
-
-# Initial guess for P0 (initial pressure in Pa) and H (lapse rate)
-initial_guess = [100000, 7500]
-
-# Bounds for P0 and H to ensure they are within realistic ranges
-# [pMin, tMin] , [pMax, tMax]
-bounds = ([0, 200], [120000, 32000])
-
-# Fit pressure to an exponential
-popt, pcov = curve_fit(exponential_model, height, pressure, p0=initial_guess, bounds=bounds)
-P0, H = popt
-print(f"Fitted Parameters:\nP0 = {P0}\nH = {H}")
-
-# Equal spaces of height
-heights_fit = np.linspace(0, 36000, 2000)
-# Fitted pressures from model
-pressures_fit = exponential_model(heights_fit, P0, H)
-
-# Predict pressure at height h 
-def predict_pressure(h):
-    return P0 * np.exp(-h / H)
-
-print(predict_pressure(21000))
-
-# Fit temperatures to a cubic
-coefficients = np.polyfit(height, temperature, 4)
-a, b, c, d, k = coefficients
-
-# Predict the temperature at height h
-def predict_temp(h):
-    return a * h**4 + b * h**3 + c * h**2 + d * h + k
-
-print(predict_temp(21000))
-temps_fit = predict_temp(heights_fit)
-
-volume_at_room_temp = tracer.moles_helium * GAS_CONSTANT * 293.15 / 101325  # m^3
-full_volume = 4/3 * np.pi * radius**3  # m^3
-
-density_at_room_temp = mass_helium / volume_at_room_temp  # kg/m^3
-
-specific_humidity_first_zero_index = np.where(specific_humidity == 0)[0][0]
-print(f"First Zero Index : {specific_humidity_first_zero_index}")
-
-coefficients_humidity = np.polyfit(height[:specific_humidity_first_zero_index], specific_humidity[:specific_humidity_first_zero_index], 3)
-e, f, i, j = coefficients_humidity
-
-def predict_specific_humidity(h):
-    val = e * h**3 + f * h**2 + i * h + j
-    return 0 if val < 0 or h > height[specific_humidity_first_zero_index] else val
-
-print(predict_specific_humidity(21000))
-humidity_fit = [predict_specific_humidity(ele) for ele in heights_fit]
-
-
-heights = np.array(all_heights).flatten()
-pressures = np.array(all_pressures).flatten()
-
-X = np.vstack((heights, times)).T
-y = pressures
-
-scaler_X = StandardScaler()
-scaler_y = StandardScaler()
-
-X_scaled = scaler_X.fit_transform(X)
-y_scaled = scaler_y.fit_transform(y.reshape(-1, 1))
-
-predict_pressure = tf.keras.models.Sequential([
-    tf.keras.layers.Dense(64, activation='relu', input_shape=(2,)),
-    tf.keras.layers.Dense(64, activation='relu'),
-    tf.keras.layers.Dense(1)
-])
-
-predict_pressure.compile(optimizer='adam', loss='mean_squared_error')
-
-predict_pressure.fit(X_scaled, y_scaled, epochs=20, batch_size=10, verbose=0)
-
-# Example prediction inputs
-new_heights = [10000, 10000]
-new_times = [3, 9]
-
-X_new = np.vstack((new_heights, new_times)).T
-X_new_scaled = scaler_X.transform(X_new)
-
-y_new_scaled = predict_pressure.predict(X_new_scaled)
-y_new = scaler_y.inverse_transform(y_new_scaled)
-
-print(f"Predicted pressures: {y_new.flatten()}")
-
-
-# Predict wind speed at height
-
-def predict_wind_speed(h):
-    if h <= height[0]:
-        return wind_speed[0]
-    if h >= height[-1]:
-        return wind_speed[-1]
-    index = 0
-    for i in range(1, len(height)):
-        if h <= height[i]:
-            index = i
-            break
-    slope = (wind_speed[index] - wind_speed[index - 1]) / (height[index] - height[index - 1])
-    b = wind_speed[index - 1] - slope * height[index - 1]
-    
-    return slope * h + b
-
-print(f"Predicted Wind Speed at 21000m : {predict_wind_speed(21000)}")
-
-wind_speed_fit = [predict_wind_speed(ele) for ele in heights_fit]
-
-def predicted_wind_direction(h):
-    if h <= height[0]:
-        return wind_direction[0]
-    if h >= height[-1]:
-        return wind_direction[-1]
-    index = 0
-    for i in range(1, len(height)):
-        if h <= height[i]:
-            index = i
-            break
-    slope = (wind_direction[index] - wind_direction[index - 1]) / (height[index] - height[index - 1])
-    b = wind_direction[index - 1] - slope * height[index - 1]
-    
-    return slope * h + b
-
-wind_direction_fit = [predicted_wind_direction(ele) for ele in heights_fit]
-
-def vectorize_wind_direction(h):
-    return np.array([-math.cos((predicted_wind_direction(h)+90)/180 * math.pi), -math.sin((predicted_wind_direction(h)-90)/180 * math.pi), 0])
-
-print(f"Predicted Wind Direction at 21000m : {predicted_wind_direction(21000)}")
-print(f"Predicted Wind Vector at 21000m : <{vectorize_wind_direction(21000)[0]},  {vectorize_wind_direction(21000)[1]}>")
-print(f"Predicted Wind Direction at 1000m : {predicted_wind_direction(1000)}")
-print(f"Predicted Wind Vector at 1000m : <{vectorize_wind_direction(1000)[0]},  {vectorize_wind_direction(1000)[1]}>")
-print(f"Predicted Wind Direction at 10000m : {predicted_wind_direction(10000)}")
-print(f"Predicted Wind Vector at 10000m : <{vectorize_wind_direction(10000)[0]},  {vectorize_wind_direction(10000)[1]}>")
-
-
-
-
-
-def molar_mass_humid_air(spec_humid):
-    r = spec_humid / (1 - spec_humid)
-    X_w = r / (r + MOLAR_MASS_DRY_AIR / MOLAR_MASS_WATER_VAPOR)
-    X_d = 1 - X_w
-    return X_d * MOLAR_MASS_DRY_AIR + X_w * MOLAR_MASS_WATER_VAPOR
-
-print(f"Molar mass of humid air: {molar_mass_humid_air(predict_specific_humidity(21000))} at 283.90 K and 1002 mB")
-print(f"Molar mass of humid air: {molar_mass_humid_air(0.0086600)} at 285.20 K and 1000 mB")
-print(f"Molar mass of dry air: {MOLAR_MASS_DRY_AIR} at 283.90 K and 1002 mB")
-
-
-# # Function to find the height where densities are equal (neutral buoyancy height) 
-# # considering the denisty of the balloon at room temp is constant
-# def find_neutral_buoyancy_height(h):
-#     return (predict_pressure(h) * MOLAR_MASS_DRY_AIR / (gas_constant * predict_temp(h))) - density_at_room_temp
-
-# # Guess 15000 m
-# initial_guess_height = 15000
-
-# # Solve for the height where densities are equal (neutral buoyancy height)
-# h_neutral_buoyancy = fsolve(find_neutral_buoyancy_height, initial_guess_height)[0]
-
-# print(f"Height for Neutral Buoyancy: {h_neutral_buoyancy} meters")
-# print(f"Actual: {find_neutral_buoyancy_height(h_neutral_buoyancy)}")
-
-# Find balloon volume at height
-def balloon_volume_at_height(h):
-    volume =  tracer.moles_helium * GAS_CONSTANT * predict_temp(h) / predict_pressure(h)
-    return full_volume if volume > full_volume else volume
-#Check THIS!!
-
-def predict_air_density(h):
-    return predict_pressure(h) * molar_mass_humid_air(predict_specific_humidity(h)) / (GAS_CONSTANT * predict_temp(h))
-
-def predict_balloon_density(h):
-    return mass_helium / balloon_volume_at_height(h)
-    
-def bouyant_force(h):
-    return GRAVITY * balloon_volume_at_height(h) * (predict_air_density(h) - predict_balloon_density(h))
-
-def gravitational_force():
-    return GRAVITY * mass_balloon + GRAVITY * mass_payload
-
-# VARY THE CROSS SECTIONAL AREA
-def drag_force(h, relative_velocity_squared):
-    return 0.5 * tracer.drag_coefficient * tracer.cross_sectional_area * predict_air_density(h) * relative_velocity_squared
-
-# Function to find the height where densities are equal (neutral buoyancy height) 
-# considering the fully inflated balloon volume
-def find_true_neutral_buoyancy_height(h):
-    # return (predict_pressure(h) * molar_mass_dry_air / (gas_constant * predict_temp(h))) - (mass_helium / balloon_volume_at_height(h))
-    return bouyant_force(h) - gravitational_force()
-
-initial_guess_height = 15000  # Adjust as needed based on your application
-
-# Solve for the height where densities are equal (neutral buoyancy height)
-h_neutral_buoyancy = fsolve(find_true_neutral_buoyancy_height, initial_guess_height)[0]
-
-print(f"Height for Neutral Buoyancy: {h_neutral_buoyancy} meters")
-print(f"Predicted volume at neutral bouyancy height: {balloon_volume_at_height(h_neutral_buoyancy)}")
-print(f"Full volume at neutral bouyancy height: {full_volume}")
-
-def plot_trajectory():
-    f = open("trajectory.txt", "w")
-    # f.write(f"x y z\n")
-    # f.write(f"{tracer.x} {tracer.y} {tracer.z}\n")
-    time_step = 1  # seconds
-    total_time = 86400  # seconds (24 hours)
-    heights = []
-    times = []
-    elapsed_time = 0
-    # for _ in range(total_time // time_step):
-    for i in range(total_time // time_step):
-        elapsed_time = i * time_step
-        # Calculate the wind velocity and velocity relative to balloon
-        wind_velocity = predict_wind_speed(tracer.z) * vectorize_wind_direction(tracer.z)
-        # Calculate bouyant force
-        bouyant = bouyant_force(tracer.z)
-        bouyant_vector = bouyant * np.array([0, 0, 1])
-        # Calculate gravitational force
-        gravitational = gravitational_force()
-        gravitational_vector = gravitational_force() * np.array([0, 0, -1])
-        # Terminal Rise Velocity
-        if (bouyant - gravitational) < 0:
-            terminal_rise_velocity = 0
-        else: 
-            terminal_rise_velocity = math.sqrt((bouyant - gravitational) / (tracer.drag_coefficient * tracer.cross_sectional_area))
-        # Calculate new position
-        tracer.x += wind_velocity[0] * time_step
-        tracer.y += wind_velocity[1] * time_step
-        tracer.z += terminal_rise_velocity * time_step
-        # Write coordinates to file
-        f.write(f"{tracer.x} {tracer.y} {tracer.z}\n")
-
-        heights.append(tracer.z)
-        times.append(elapsed_time)
-        
-        # print(f'\n############### ITERATION {i+1} ##################\n')
-        # print(f"Wind Velocity: {wind_velocity}")
-        # print(f"Bouyant: {bouyant}")
-        # print(f"Bouyant Vector: {bouyant_vector}")
-        # print(f"Gravitational: {gravitational}")
-        # print(f"Gravitational Vector: {gravitational_vector}")
-        # print(f"Terminal Rise Velocity: {terminal_rise_velocity}")
-        # print(f'New Position: {tracer.x}, {tracer.y}, {tracer.z}')
-
-
-    f.close()
-    return heights, times
-
-calculated_heights, calculated_times = plot_trajectory()
-        
-
-
-
-# Plot the data as subplots within a single figure
-fig, axs = plt.subplots(2, 3, figsize=(8, 8))
-
-# Pressure vs. Height
-axs[0, 0].scatter(height, pressure, color='red', label='Data')
-axs[0, 0].plot(heights_fit, pressures_fit, color='blue', label='Fit')
-axs[0, 0].set_xlabel('Height (m)')
-axs[0, 0].set_ylabel('Pressure (Pa)')
-axs[0, 0].set_title('Exponential Fit to Pressure vs. Height Data')
-axs[0, 0].legend()
-axs[0, 0].grid(True)
-
-# Temperature vs. Height
-axs[0, 1].scatter(height, temperature, color='red', label='Data')
-axs[0, 1].plot(heights_fit, temps_fit, color='blue', label='Fit')
-axs[0, 1].set_xlabel('Height (m)')
-axs[0, 1].set_ylabel('Temperature (K)')
-axs[0, 1].set_title('Quadric Fit to Temperature vs. Height Data')
-axs[0, 1].legend()
-axs[0, 1].grid(True)
-
-# Specific Humidity vs. Height
-axs[1, 0].scatter(height, specific_humidity, color='red', label='Data')
-axs[1, 0].plot(heights_fit, humidity_fit, color='blue', label='Fit')
-axs[1, 0].set_xlabel('Height (m)')
-axs[1, 0].set_ylabel('Specific Humidity (kg/kg)')
-axs[1, 0].set_title('Cubic Fit to Specific Humidity vs. Height Data')
-axs[1, 0].legend()
-axs[1, 0].grid(True)
-
-# Wind Speed vs. Height
-axs[1, 1].scatter(height, wind_speed, color='red', label='Data')
-axs[1, 1].plot(heights_fit, wind_speed_fit, color='blue', label='Fit')
-axs[1, 1].set_xlabel('Height (m)')
-axs[1, 1].set_ylabel('Wind Speed m/s')
-axs[1, 1].set_title('Linear Interpolation Fit to Wind Speed vs. Height Data')
-axs[1, 1].legend()
-axs[1, 1].grid(True)
-
-# Wind Direction vs. Height
-axs[0, 2].scatter(height, wind_direction, color='red', label='Data')
-axs[0, 2].plot(heights_fit, wind_direction_fit, color='blue', label='Fit')
-axs[0, 2].set_xlabel('Height (m)')
-axs[0, 2].set_ylabel('Wind Direction (degrees)')
-axs[0, 2].set_title('Linear Interpolation Fit to Wind Direction vs. Height Data')
-axs[0, 2].legend()
-axs[0, 2].grid(True)
-
-# Plot the calculated heights
-axs[1, 2].plot([i / 3600 for i in calculated_times], calculated_heights, color='blue', label='Calculated Heights')
-axs[1, 2].set_xlabel('Time (hrs)')
-axs[1, 2].set_ylabel('Height (m)')
-axs[1, 2].set_title('Calculated Heights vs. Time')
-axs[1, 2].legend()
-
-# Adjust layout
-plt.tight_layout()
-plt.show()
+# One flight: a balloon launched at (latitude, longitude) on the given day, with soundings at the given UTC hours
+# Pass soundings to use rows you already have instead of fetching them with retrieve_tables
+# Every derived quantity is built the first time it is used and kept for later calls
+class FlightModel:
+    def __init__(self, year=2024, month=7, day=16, latitude=45, longitude=-125, hours=(0, 6, 12, 18),
+                 balloon=None, soundings=None, cache_dir=CACHE_DIR, temperature_degree=4, humidity_degree=3):
+        self.year = year
+        self.month = month
+        self.day = day
+        self.latitude = latitude
+        self.longitude = longitude
+        self.hours = list(hours)
+        self.balloon = balloon if balloon is not None else Balloon(radius, mass_helium, mass_balloon, mass_payload)
+        self.cache_dir = cache_dir
+        self.temperature_degree = temperature_degree
+        self.humidity_degree = humidity_degree
+        self.full_volume = 4/3 * np.pi * self.balloon.radius**3  # m^3
+        self._soundings = soundings
+        self._atmospheres = None
+        self._table = None
+        self._field = None
+        self._neutral_buoyancy_height = None
+        self._pressure_network = None
+
+    def _cache_path(self, name):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        return os.path.join(self.cache_dir, name)
+
+    @property
+    def soundings(self):
+        if self._soundings is None:
+            from ncep_scraper import retrieve_tables
+            with stage('fetch'):
+                soundings = retrieve_tables([(self.year, self.month, self.day, hour, self.latitude, self.longitude)
+                                             for hour in self.hours])
+            for sounding in soundings:
+                if isinstance(sounding, Exception):
+                    raise sounding
+            self._soundings = soundings
+        return self._soundings
+
+    # The 00 UTC sounding drives the single-profile physics, as before
+    @property
+    def data(self):
+        return self.soundings[0]
+
+    # One fitted Atmosphere per sounding, loading the fit from the cache when the sounding was seen before
+    @property
+    def atmospheres(self):
+        if self._atmospheres is None:
+            soundings = self.soundings
+            with stage('fit'):
+                if self.cache_dir:
+                    cache = FitCache(self._cache_path('fits.sqlite'))
+                    self._atmospheres = [cache.atmosphere(data, self.temperature_degree, self.humidity_degree) for data in soundings]
+                else:
+                    self._atmospheres = [Atmosphere(data, self.temperature_degree, self.humidity_degree) for data in soundings]
+        return self._atmospheres
+
+    @property
+    def atmosphere(self):
+        return self.atmospheres[0]
+
+    # Bouyant force and rise velocity of the balloon sampled on a fine altitude grid
+    @property
+    def table(self):
+        if self._table is None:
+            atmosphere = self.atmosphere
+            with stage('fit'):
+                self._table = AtmosphereTable(atmosphere, self.balloon)
+        return self._table
+
+    # The same quantities for all soundings, interpolated in altitude and time
+    @property
+    def field(self):
+        if self._field is None:
+            atmospheres = self.atmospheres
+            with stage('fit'):
+                self._field = AtmosphereField(atmospheres, hours=self.hours, balloon=self.balloon)
+        return self._field
+
+    # Predict pressure at height h
+    def predict_pressure(self, h):
+        return self.atmosphere.predict_pressure(h)
+
+    # Predict the temperature at height h
+    def predict_temp(self, h):
+        return self.atmosphere.predict_temp(h)
+
+    def predict_specific_humidity(self, h):
+        return self.atmosphere.predict_specific_humidity(h)
+
+    @profiled()
+    def predict_wind_speed(self, h):
+        return self.atmosphere.predict_wind_speed(h)
+
+    def predicted_wind_direction(self, h):
+        return self.atmosphere.predicted_wind_direction(h)
+
+    def vectorize_wind_direction(self, h):
+        x, y = self.atmosphere.wind.direction_vector(h)
+        return np.array([x, y, 0])
+
+    # Find balloon volume at height
+    @profiled()
+    def balloon_volume_at_height(self, h):
+        volume = self.balloon.moles_helium * GAS_CONSTANT * self.predict_temp(h) / self.predict_pressure(h)
+        return np.minimum(volume, self.full_volume)
+
+    @profiled()
+    def predict_air_density(self, h):
+        return self.predict_pressure(h) * molar_mass_humid_air(self.predict_specific_humidity(h)) / (GAS_CONSTANT * self.predict_temp(h))
+
+    def predict_balloon_density(self, h):
+        return self.balloon.mass_helium / self.balloon_volume_at_height(h)
+
+    @profiled()
+    def bouyant_force(self, h):
+        return GRAVITY * self.balloon_volume_at_height(h) * (self.predict_air_density(h) - self.predict_balloon_density(h))
+
+    def gravitational_force(self):
+        return GRAVITY * self.balloon.mass_balloon + GRAVITY * self.balloon.mass_payload
+
+    # VARY THE CROSS SECTIONAL AREA
+    def drag_force(self, h, relative_velocity_squared):
+        return 0.5 * self.balloon.drag_coefficient * self.balloon.cross_sectional_area * self.predict_air_density(h) * relative_velocity_squared
+
+    # Function to find the height where densities are equal (neutral buoyancy height)
+    # considering the fully inflated balloon volume
+    def find_true_neutral_buoyancy_height(self, h):
+        return self.bouyant_force(h) - self.gravitational_force()
+
+    def neutral_buoyancy_height(self, initial_guess_height=15000):
+        if self._neutral_buoyancy_height is None:
+            from scipy.optimize import fsolve
+            # Solve for the height where densities are equal (neutral buoyancy height)
+            with stage('solve'):
+                self._neutral_buoyancy_height = fsolve(self.find_true_neutral_buoyancy_height, initial_guess_height)[0]
+        return self._neutral_buoyancy_height
+
+    # Float altitude over every combination of the given parameter axes, see atmosphere.float_altitude_map
+    def float_altitude_map(self, radii, helium_masses, balloon_masses, payload_masses=(0,)):
+        atmosphere = self.atmosphere
+        with stage('solve'):
+            return float_altitude_map(AtmosphereTable(atmosphere), radii, helium_masses, balloon_masses, payload_masses)
+
+    # Small network that interpolates pressure in height and time across all soundings
+    # Trained weights are cached on disk, so a sounding set is only ever trained once
+    def pressure_network(self, epochs=20):
+        if self._pressure_network is None:
+            from sklearn.preprocessing import StandardScaler
+            import tensorflow as tf
+
+            heights = np.concatenate([atmosphere.height for atmosphere in self.atmospheres])
+            times = np.concatenate([np.full(len(atmosphere.height), hour) for atmosphere, hour in zip(self.atmospheres, self.hours)])
+            pressures = np.concatenate([atmosphere.pressure for atmosphere in self.atmospheres])
+
+            X = np.vstack((heights, times)).T
+            y = pressures
+
+            scaler_X = StandardScaler()
+            scaler_y = StandardScaler()
+
+            X_scaled = scaler_X.fit_transform(X)
+            y_scaled = scaler_y.fit_transform(y.reshape(-1, 1))
+
+            network = tf.keras.models.Sequential([
+                tf.keras.layers.Input(shape=(2,)),
+                tf.keras.layers.Dense(64, activation='relu'),
+                tf.keras.layers.Dense(64, activation='relu'),
+                tf.keras.layers.Dense(1)
+            ])
+
+            network.compile(optimizer='adam', loss='mean_squared_error')
+
+            path = None
+            if self.cache_dir:
+                key = profile_key(self.soundings, 'pressure_network', self.hours, epochs)
+                path = self._cache_path(f'pressure_network_{key}.weights.h5')
+            with stage('train'):
+                if path and os.path.exists(path):
+                    network.load_weights(path)
+                else:
+                    network.fit(X_scaled, y_scaled, epochs=epochs, batch_size=10, verbose=0)
+                    if path:
+                        network.save_weights(path)
+            self._pressure_network = (network, scaler_X, scaler_y)
+        return self._pressure_network
+
+    def predict_pressure_in_time(self, heights, hours):
+        network, scaler_X, scaler_y = self.pressure_network()
+        X_new = np.vstack((heights, hours)).T
+        y_new_scaled = network.predict(scaler_X.transform(X_new), verbose=0)
+        return scaler_y.inverse_transform(y_new_scaled).flatten()
+
+    # Stream the trajectory while it is computed instead of returning it at the end
+    # Yields one TRAJECTORY_DTYPE record per step, or with chunk_size arrays of up to chunk_size records
+    # Only one chunk is held at a time, so memory does not grow with the flight duration.
+    # Stop early by leaving the loop, the balloon keeps the position of the last yielded step
+    # launch_time (s after 00 UTC) starts the flight later in the day, total_time is counted from launch
+    def stream_trajectory(self, total_time=86400, time_step=1, chunk_size=None, launch_time=0):
+        tracer = self.balloon
+        field = self.field
+        n_steps = total_time // time_step
+        buffer = np.zeros(chunk_size or 1, dtype=TRAJECTORY_DTYPE)
+        count = 0
+        for i in range(n_steps):
+            elapsed_time = launch_time + i * time_step
+            # Wind from the soundings around the current time and terminal rise velocity from the precomputed field,
+            # both from one lookup
+            u, v, terminal_rise_velocity = field.velocity(tracer.z, elapsed_time)
+            # Calculate new position
+            tracer.x += u * time_step
+            tracer.y += v * time_step
+            tracer.z += terminal_rise_velocity * time_step
+            buffer[count] = (elapsed_time, tracer.x, tracer.y, tracer.z, u, v, terminal_rise_velocity)
+            count += 1
+            if chunk_size is None:
+                yield buffer[0].copy()
+                count = 0
+            elif count == chunk_size:
+                yield buffer.copy()
+                count = 0
+        if count:
+            yield buffer[:count].copy()
+
+    # Trajectory is recorded into a preallocated array and written to trajectory.npy in bulk
+    # output_stride keeps every n-th step, load the result with np.load("trajectory.npy", mmap_mode='r')
+    def plot_trajectory(self, output_stride=1, output_path="trajectory.npy", total_time=86400, time_step=1):
+        n_steps = total_time // time_step
+        recorder = TrajectoryRecorder(n_steps, stride=output_stride, path=output_path)
+        step = 0
+        with stage('simulate'):
+            for chunk in self.stream_trajectory(total_time, time_step, chunk_size=4096):
+                recorder.extend(step, chunk)
+                step += len(chunk)
+
+        records = recorder.close()
+        return records['z'], records['t']
+
+    # Adaptive-step alternative to plot_trajectory, integrating through the same time-dependent field
+    # Stops at burst or ground contact and takes long steps once the balloon floats at the neutral buoyancy height
+    # Returns heights, times and the events dict of integrate_flight (float, burst and ground times, None if not reached)
+    def adaptive_trajectory(self, total_time=86400, output_path="trajectory.npy"):
+        from integrator import integrate_flight
+        tracer = self.balloon
+        field = self.field
+        neutral_height = self.neutral_buoyancy_height()
+        with stage('simulate'):
+            times, states, events = integrate_flight(field, total_time, initial_state=[tracer.x, tracer.y, tracer.z],
+                                                     neutral_height=neutral_height,
+                                                     popping_pressure_difference=popping_pressure_difference)
+        tracer.x, tracer.y, tracer.z = states[-1]
+        np.save(output_path, trajectory_array(times, states[:, 0], states[:, 1], states[:, 2]))
+        return states[:, 2], times, events
+
+    # The 2x3 diagnostic figure: fits against the 00 UTC sounding and the calculated heights
+    # With output_path the figure is drawn headless on the Agg canvas and written to that file instead of shown
+    # The calculated heights are reduced to max_points with LTTB first (None plots every point)
+    def plot_diagnostics(self, calculated_heights, calculated_times, output_path=None, max_points=2000):
+        if output_path is None:
+            import matplotlib.pyplot as plt
+        else:
+            from matplotlib.figure import Figure
+
+        calculated_heights = np.asarray(calculated_heights)
+        calculated_times = np.asarray(calculated_times)
+        if max_points:
+            kept = lttb(calculated_times, calculated_heights, max_points)
+            calculated_heights = calculated_heights[kept]
+            calculated_times = calculated_times[kept]
+
+        atmosphere = self.atmosphere
+        height = atmosphere.height
+        # Equal spaces of height
+        heights_fit = np.linspace(0, 36000, 2000)
+
+        # Time spent drawing, not the time the window stays open
+        with stage('plot'):
+            # Plot the data as subplots within a single figure
+            if output_path is None:
+                fig, axs = plt.subplots(2, 3, figsize=(8, 8))
+            else:
+                fig = Figure(figsize=(8, 8))
+                axs = fig.subplots(2, 3)
+
+            # Pressure vs. Height
+            axs[0, 0].scatter(height, atmosphere.pressure, color='red', label='Data')
+            axs[0, 0].plot(heights_fit, exponential_model(heights_fit, atmosphere.P0, atmosphere.H), color='blue', label='Fit')
+            axs[0, 0].set_xlabel('Height (m)')
+            axs[0, 0].set_ylabel('Pressure (Pa)')
+            axs[0, 0].set_title('Exponential Fit to Pressure vs. Height Data')
+            axs[0, 0].legend()
+            axs[0, 0].grid(True)
+
+            # Temperature vs. Height
+            axs[0, 1].scatter(height, atmosphere.temperature, color='red', label='Data')
+            axs[0, 1].plot(heights_fit, self.predict_temp(heights_fit), color='blue', label='Fit')
+            axs[0, 1].set_xlabel('Height (m)')
+            axs[0, 1].set_ylabel('Temperature (K)')
+            axs[0, 1].set_title('Quadric Fit to Temperature vs. Height Data')
+            axs[0, 1].legend()
+            axs[0, 1].grid(True)
+
+            # Specific Humidity vs. Height
+            axs[1, 0].scatter(height, atmosphere.specific_humidity, color='red', label='Data')
+            axs[1, 0].plot(heights_fit, self.predict_specific_humidity(heights_fit), color='blue', label='Fit')
+            axs[1, 0].set_xlabel('Height (m)')
+            axs[1, 0].set_ylabel('Specific Humidity (kg/kg)')
+            axs[1, 0].set_title('Cubic Fit to Specific Humidity vs. Height Data')
+            axs[1, 0].legend()
+            axs[1, 0].grid(True)
+
+            # Wind Speed vs. Height
+            axs[1, 1].scatter(height, atmosphere.wind_speed, color='red', label='Data')
+            axs[1, 1].plot(heights_fit, self.predict_wind_speed(heights_fit), color='blue', label='Fit')
+            axs[1, 1].set_xlabel('Height (m)')
+            axs[1, 1].set_ylabel('Wind Speed m/s')
+            axs[1, 1].set_title('Linear Interpolation Fit to Wind Speed vs. Height Data')
+            axs[1, 1].legend()
+            axs[1, 1].grid(True)
+
+            # Wind Direction vs. Height
+            axs[0, 2].scatter(height, atmosphere.wind_direction, color='red', label='Data')
+            axs[0, 2].plot(heights_fit, self.predicted_wind_direction(heights_fit), color='blue', label='Fit')
+            axs[0, 2].set_xlabel('Height (m)')
+            axs[0, 2].set_ylabel('Wind Direction (degrees)')
+            axs[0, 2].set_title('Linear Interpolation Fit to Wind Direction vs. Height Data')
+            axs[0, 2].legend()
+            axs[0, 2].grid(True)
+
+            # Plot the calculated heights
+            axs[1, 2].plot(calculated_times / 3600, calculated_heights, color='blue', label='Calculated Heights')
+            axs[1, 2].set_xlabel('Time (hrs)')
+            axs[1, 2].set_ylabel('Height (m)')
+            axs[1, 2].set_title('Calculated Heights vs. Time')
+            axs[1, 2].legend()
+
+            # Adjust layout
+            fig.tight_layout()
+            if output_path is not None:
+                fig.savefig(output_path)
+        if output_path is None:
+            plt.show()
+
+# Draw one run's diagnostic figure to file, in a worker process of render_diagnostics
+# The figure only shows the first sounding, so only that one is fitted
+def _render_diagnostics(soundings, hours, heights, times, output_path, cache_dir, max_points):
+    flight = FlightModel(hours=hours[:1], soundings=soundings[:1], cache_dir=cache_dir)
+    flight.plot_diagnostics(heights, times, output_path=output_path, max_points=max_points)
+    return output_path
+
+# Write the diagnostic figures of a batch of runs to files, headless and in parallel worker processes
+# runs holds (soundings, calculated_heights, calculated_times, output_path) per figure
+# Returns the written paths in the order of runs
+def render_diagnostics(runs, hours=(0, 6, 12, 18), workers=None, cache_dir=CACHE_DIR, max_points=2000):
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = [executor.submit(_render_diagnostics, soundings, list(hours), heights, times, output_path, cache_dir, max_points)
+                   for soundings, heights, times, output_path in runs]
+        return [future.result() for future in futures]
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--figure', default=None, help='Write the diagnostic figure to this file instead of showing it')
+    parser.add_argument('--adaptive', action='store_true', help='Use the adaptive-step integrator instead of 1 s steps')
+    args = parser.parse_args()
+
+    model = FlightModel()
+
+    # Example prediction inputs
+    print(f"Predicted pressures: {model.predict_pressure_in_time([10000, 10000], [3, 9])}")
+
+    print(f"Fitted Parameters:\nP0 = {model.atmosphere.P0}\nH = {model.atmosphere.H}")
+    print(model.predict_pressure(21000))
+    print(model.predict_temp(21000))
+    print(f"First Zero Index : {model.atmosphere.specific_humidity_first_zero_index}")
+    print(model.predict_specific_humidity(21000))
+
+    print(f"Predicted Wind Speed at 21000m : {model.predict_wind_speed(21000)}")
+    for h in [21000, 1000, 10000]:
+        vector = model.vectorize_wind_direction(h)
+        print(f"Predicted Wind Direction at {h}m : {model.predicted_wind_direction(h)}")
+        print(f"Predicted Wind Vector at {h}m : <{vector[0]},  {vector[1]}>")
+
+    print(f"Molar mass of humid air: {molar_mass_humid_air(model.predict_specific_humidity(21000))} at 283.90 K and 1002 mB")
+    print(f"Molar mass of humid air: {molar_mass_humid_air(0.0086600)} at 285.20 K and 1000 mB")
+    print(f"Molar mass of dry air: {MOLAR_MASS_DRY_AIR} at 283.90 K and 1002 mB")
+
+    h_neutral_buoyancy = model.neutral_buoyancy_height()
+    print(f"Height for Neutral Buoyancy: {h_neutral_buoyancy} meters")
+    print(f"Predicted volume at neutral bouyancy height: {model.balloon_volume_at_height(h_neutral_buoyancy)}")
+    print(f"Full volume at neutral bouyancy height: {model.full_volume}")
+
+    if args.adaptive:
+        calculated_heights, calculated_times, events = model.adaptive_trajectory()
+        print(f"Flight events: {events} after {len(calculated_times)} steps")
+    else:
+        calculated_heights, calculated_times = model.plot_trajectory()
+    model.plot_diagnostics(calculated_heights, calculated_times, output_path=args.figure)
+
+    if is_enabled():
+        print(report())
@@ -0,0 +1,95 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from atmosphere import Atmosphere, AtmosphereField
+from ensemble import Ensemble
+import model
+
+# Default launch uncertainty: (mean, standard deviation) of a normal distribution per parameter
+# wind_error is the standard deviation (m/s) of a constant per-member offset on each wind component
+DEFAULT_SPREAD = {
+    'radius': (model.radius, 0.01),  # m
+    'mass_helium': (model.mass_helium, 0.5 / 1000),  # kg
+    'mass_balloon': (model.mass_balloon, 1 / 1000),  # kg
+    'drag_coefficient': (model.DRAG_COEFFICIENT_SPHERE, 0.03),
+    'wind_error': (0, 1.0),  # m/s
+}
+
+# Draw the parameters of `members` balloons from one random stream
+def sample_members(rng, members, spread):
+    samples = {}
+    for name in ('radius', 'mass_helium', 'mass_balloon', 'drag_coefficient'):
+        mean, std = spread[name]
+        samples[name] = rng.normal(mean, std, members)
+    mean, std = spread['wind_error']
+    samples['wind_error_u'] = rng.normal(mean, std, members)
+    samples['wind_error_v'] = rng.normal(mean, std, members)
+    return samples
+
+# Run one chunk of the ensemble in a worker process
+# Each chunk has its own SeedSequence child, so results do not depend on how chunks land on workers
+def _run_chunk(atmospheres, hours, seed_sequence, members, spread, mass_payload, total_time, time_step, popping_pressure_difference):
+    rng = np.random.default_rng(seed_sequence)
+    samples = sample_members(rng, members, spread)
+    field = AtmosphereField(atmospheres, hours=hours)
+    ensemble = Ensemble(field, samples['radius'], samples['mass_helium'], samples['mass_balloon'], mass_payload,
+                        drag_coefficient=samples['drag_coefficient'],
+                        wind_error_u=samples['wind_error_u'], wind_error_v=samples['wind_error_v'],
+                        popping_pressure_difference=popping_pressure_difference)
+    n_steps = int(total_time // time_step)
+    for i in range(n_steps):
+        ensemble.step(time_step, i * time_step)
+    samples.update(x=ensemble.x, y=ensemble.y, z=ensemble.z, burst=ensemble.burst, burst_time=ensemble.burst_time)
+    return samples
+
+# Ellipse around (x, y) containing the given percentile of a fitted 2-D normal distribution
+# Returns the centre, semi-major and semi-minor axes (m) and the angle of the major axis (radians from +x)
+# or None when there are no points
+def percentile_ellipse(x, y, percentile):
+    if len(x) == 0:
+        return None
+    center = np.array([np.mean(x), np.mean(y)])
+    if len(x) < 2:
+        return {'center': center, 'semi_major': 0.0, 'semi_minor': 0.0, 'angle': 0.0}
+    eigenvalues, eigenvectors = np.linalg.eigh(np.cov(x, y))
+    scale = -2 * np.log(1 - percentile / 100)  # chi-squared quantile with 2 degrees of freedom
+    semi_minor, semi_major = np.sqrt(np.maximum(eigenvalues, 0) * scale)
+    angle = np.arctan2(eigenvectors[1, 1], eigenvectors[0, 1])
+    return {'center': center, 'semi_major': semi_major, 'semi_minor': semi_minor, 'angle': angle}
+
+# Monte Carlo over launch uncertainty using the model.py physics on the given soundings
+# soundings are rows from retrieve_table (or fitted Atmosphere objects) taken at `hours` UTC
+# Members are split into chunks of chunk_size and spread over a process pool of `workers` processes
+# Returns the sampled parameters and final state of every member plus summary arrays:
+#   float_ellipses  - percentile ellipses of the final position of members that did not burst
+#   burst_ellipses  - the same for the positions where members burst
+#   float_histogram - (counts, bin_edges) of the final altitude of members that did not burst
+def run_monte_carlo(soundings, members=1000, hours=(0, 6, 12, 18), spread=None, seed=0, workers=None, chunk_size=250,
+                    total_time=86400, time_step=1, mass_payload=model.mass_payload,
+                    popping_pressure_difference=model.popping_pressure_difference, percentiles=(50, 90, 95), bins=50):
+    spread = dict(DEFAULT_SPREAD, **(spread or {}))
+    # Fit once here, workers only resample the fits onto their altitude grid
+    atmospheres = [data if isinstance(data, Atmosphere) else Atmosphere(data) for data in soundings]
+    sizes = [min(chunk_size, members - start) for start in range(0, members, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    workers = workers or os.cpu_count()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_run_chunk, atmospheres, list(hours), seed_sequence, size, spread, mass_payload,
+                                   total_time, time_step, popping_pressure_difference)
+                   for seed_sequence, size in zip(seeds, sizes)]
+        chunks = [future.result() for future in futures]
+
+    results = {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+    floating = ~results['burst']
+    results['float_ellipses'] = {p: percentile_ellipse(results['x'][floating], results['y'][floating], p) for p in percentiles}
+    results['burst_ellipses'] = {p: percentile_ellipse(results['x'][~floating], results['y'][~floating], p) for p in percentiles}
+    results['float_histogram'] = np.histogram(results['z'][floating], bins=bins)
+    return results
+
+if __name__ == '__main__':
+    flight = model.FlightModel()
+    results = run_monte_carlo(flight.soundings, hours=flight.hours)
+    print(f"Burst fraction: {np.mean(results['burst'])}")
+    for p, ellipse in results['float_ellipses'].items():
+        print(f"{p}% float ellipse: {ellipse}")
@@ -1,7 +1,150 @@
-import requests
-from bs4 import BeautifulSoup
+import os
 import re
-def retrieve_table(year = 2024, month = 7, day = 16, hour = 6, latitude = 45, longitude = -125):
+import time
+import threading
+import requests
+import http_client
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from atmosphere import SOUNDING_DTYPE
+from sounding_cache import SoundingCache
+
+# Scraped soundings are kept in this SQLite file so a repeated request never touches the network
+# Set SOUNDING_CACHE to another path to move it, or to an empty string to turn caching off
+SOUNDING_CACHE = os.environ.get('SOUNDING_CACHE', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.sounding_cache.sqlite'))
+# Optional size bound (bytes) of the cache, least recently used soundings are dropped beyond it
+SOUNDING_CACHE_MAX_BYTES = int(os.environ['SOUNDING_CACHE_MAX_BYTES']) if os.environ.get('SOUNDING_CACHE_MAX_BYTES') else None
+
+# Politeness limits for psl.noaa.gov, shared by every batch in this process
+NOAA_MAX_CONCURRENT = 4  # requests in flight at once
+NOAA_RATE = 2.0  # request starts per second
+
+_default_cache = None
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None and SOUNDING_CACHE:
+        _default_cache = SoundingCache(SOUNDING_CACHE, SOUNDING_CACHE_MAX_BYTES)
+    return _default_cache
+
+class SoundingError(Exception):
+    pass
+
+def _resolve_cache(cache):
+    if cache is None:
+        return default_cache()
+    return None if cache is False else cache
+
+# Like retrieve_sounding, but raises SoundingError instead of returning None
+# limiter (a HostLimiter) is only entered when the sounding has to be scraped
+# While http_client records a cassette the cache is not read, so every sounding is requested and ends up in the
+# cassette (a cache hit would leave nothing to replay on a machine without this cache); fetched soundings are still stored
+def load_sounding(year = 2024, month = 7, day = 16, hour = 6, latitude = 45, longitude = -125, cache = None, limiter = None):
+    cache = _resolve_cache(cache)
+    if cache is not None and http_client.client.mode != 'record':
+        stored = cache.get(year, month, day, hour, latitude, longitude)
+        if stored is not None:
+            return stored
+    if limiter is None:
+        sounding = fetch_sounding(year, month, day, hour, latitude, longitude)
+    else:
+        with limiter:
+            sounding = fetch_sounding(year, month, day, hour, latitude, longitude)
+    # Empty responses are not stored, so they are retried next time
+    if cache is not None and len(sounding[1]):
+        cache.put(year, month, day, hour, latitude, longitude, *sounding)
+    return sounding
+
+# (header, sounding) of a sounding, from the cache when it was scraped before, or None if it cannot be retrieved
+# sounding is a SOUNDING_DTYPE array with missing values as NaN
+# cache=None uses default_cache(), cache=False always scrapes, or pass your own SoundingCache
+def retrieve_sounding(year = 2024, month = 7, day = 16, hour = 6, latitude = 45, longitude = -125, cache = None):
+    try:
+        return load_sounding(year, month, day, hour, latitude, longitude, cache)
+    except SoundingError as e:
+        print(f"Error: {e}")
+        return None
+
+# The sounding as a SOUNDING_DTYPE array (missing values are NaN), or None if it cannot be retrieved
+def retrieve_array(year = 2024, month = 7, day = 16, hour = 6, latitude = 45, longitude = -125, cache = None):
+    sounding = retrieve_sounding(year, month, day, hour, latitude, longitude, cache)
+    return None if sounding is None else sounding[1]
+
+# The sounding as plain rows with -999.0 for missing values, the format the scraper always returned
+def retrieve_table(year = 2024, month = 7, day = 16, hour = 6, latitude = 45, longitude = -125, cache = None):
+    sounding = retrieve_sounding(year, month, day, hour, latitude, longitude, cache)
+    return None if sounding is None else sounding_rows(sounding[1])
+
+# Caps the requests in flight to one host and spaces their starts at least 1 / rate seconds apart
+class HostLimiter:
+    def __init__(self, max_concurrent=NOAA_MAX_CONCURRENT, rate=NOAA_RATE):
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+        self.interval = 1 / rate if rate else 0
+        self.lock = threading.Lock()
+        self.next_start = 0
+
+    def __enter__(self):
+        self.slots.acquire()
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+        return self
+
+    def __exit__(self, *exc):
+        self.slots.release()
+        return False
+
+noaa_limiter = HostLimiter()
+
+# Fetch many soundings concurrently on a bounded thread pool
+# requests holds (year, month, day, hour, latitude, longitude) tuples or dicts with those keys
+# Cached soundings come straight from the cache, the rest go through limiter (noaa_limiter by default)
+# and repeated requests are only fetched once. Returns one entry per request, in input order:
+# the SOUNDING_DTYPE array like retrieve_array, or the SoundingError (or other exception) raised for that request
+def retrieve_tables(requests, workers = 8, cache = None, limiter = None):
+    limiter = limiter or noaa_limiter
+    keys = [tuple(request[name] for name in ('year', 'month', 'day', 'hour', 'latitude', 'longitude'))
+            if isinstance(request, dict) else tuple(request) for request in requests]
+    unique = list(dict.fromkeys(keys))
+
+    def load(key):
+        try:
+            return load_sounding(*key, cache=cache, limiter=limiter)[1]
+        except Exception as e:
+            return e
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = dict(zip(unique, executor.map(load, unique)))
+    return [results[key] for key in keys]
+
+_TABLE = re.compile(rb'<table.*?</table>', re.S | re.I)
+_HEADER_CELL = re.compile(rb'<td>(.*?)</td>')
+_VALUE_CELL = re.compile(rb'<td align="right">\s*([^<]*?)\s*</td>')
+
+# Parse the first table of a psl.noaa.gov profile page in one pass over the response bytes
+# Returns the header and a SOUNDING_DTYPE array with -999.0 (missing) mapped to NaN
+def parse_sounding(content):
+    table = _TABLE.search(content)
+    if table is None:
+        raise SoundingError("No data table in the response")
+    table = table.group(0)
+    header_end = table.find(b'</tr>')
+    header = [cell.decode().strip() for cell in _HEADER_CELL.findall(table, 0, header_end)]
+    values = np.array(_VALUE_CELL.findall(table, header_end), dtype=float)
+    columns = len(SOUNDING_DTYPE.names)
+    if len(values) % columns:
+        raise SoundingError(f"Sounding table has {len(values)} values, not a multiple of {columns} columns")
+    values[values == -999.0] = np.nan
+    return header, values.reshape(-1, columns).view(SOUNDING_DTYPE)[:, 0]
+
+# Plain rows like the scraper always returned, with NaN written back as -999.0
+def sounding_rows(sounding):
+    return np.nan_to_num(sounding.view(float), nan=-999.0).reshape(len(sounding), -1).tolist()
+
+# Scrape one sounding from psl.noaa.gov, returns (header, SOUNDING_DTYPE array) or raises SoundingError
+def fetch_sounding(year = 2024, month = 7, day = 16, hour = 6, latitude = 45, longitude = -125):
     url = "https://psl.noaa.gov/cgi-bin/profile/makeplot.pl"
     params = {
         "maintype": 1,
@@ -28,31 +171,21 @@ def retrieve_table(year = 2024, month = 7, day = 16, hour = 6, latitude = 45, lo
         "lon2": "",
         "submit": "Create+Plot%2FGet+Data"
     }
-    
+
     try:
-        response = requests.get(url, params=params)
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.content, 'html.parser')
-            table = str(soup.find('table'))
-            # print(table)
-            # Remove HTML tags and extract the data
-            rows = re.findall(r'<tr>(.*?)</tr>', table)
-            header = re.findall(r'<td>(.*?)</td>', rows[0])
-            data = []
-
-            for row in rows[1:]:
-                cols = re.findall(r'<td align="right">(.*?)</td>', row)
-                data.append([float(col.strip()) for col in cols])
-
-            # Print the header and data array
-            print(f"Scraped Data at ({latitude}, {longitude}) on {month}/{day}/{year} at {hour} UTC")
-            print("Header:", header)
-            print("Data array:")
-            for row in data:
-                print(row)
-            return data
-        else:
-            return None
-    except requests.RequestException:
-        print("Error: Unable to retrieve data from the NOAA website.")
-        return None
+        response = http_client.get(url, params=params)
+    except requests.RequestException as e:
+        raise SoundingError(f"Unable to retrieve data from the NOAA website: {e}") from e
+    if response.status_code != 200:
+        raise SoundingError(f"NOAA website returned HTTP {response.status_code} for ({latitude}, {longitude}) on {month}/{day}/{year} at {hour} UTC")
+    try:
+        header, sounding = parse_sounding(response.content)
+    except SoundingError as e:
+        raise SoundingError(f"{e} for ({latitude}, {longitude}) on {month}/{day}/{year} at {hour} UTC") from None
+
+    # Print the header and data array
+    print(f"Scraped Data at ({latitude}, {longitude}) on {month}/{day}/{year} at {hour} UTC")
+    print("Header:", header)
+    print("Data array:")
+    print(sounding)
+    return header, sounding
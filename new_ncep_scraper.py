@@ -1,4 +1,4 @@
-import requests
+import http_client
 
 # Define your User-Agent
 headers = {
@@ -13,7 +13,7 @@ longitude = -77.0364
 points_url = f'https://api.weather.gov/points/{latitude},{longitude}'
 
 # Send a request to get the points data
-response = requests.get(points_url, headers=headers)
+response = http_client.get(points_url, headers=headers)
 if response.status_code == 200:
     points_data = response.json()
 else:
@@ -31,7 +31,7 @@ print(f'Office: {office}, GridX: {gridX}, GridY: {gridY}')
 forecast_url = f'https://api.weather.gov/gridpoints/{office}/{gridX},{gridY}/forecast'
 
 # Send a request to get the forecast data
-response = requests.get(forecast_url, headers=headers)
+response = http_client.get(forecast_url, headers=headers)
 if response.status_code == 200:
     forecast_data = response.json()
 else:
@@ -1,5 +1,5 @@
 from bs4 import BeautifulSoup
-import requests
+import http_client
 
 def extract_table_data(html_content):
     # Parse the HTML content
@@ -34,7 +34,7 @@ def query_noaa_atmospheric_profile(year, month, day, hour, longitude, latitude):
     url = f'{base_url}{endpoint}?maintype=1&var=air&level=100&datatype=reanalysis&lat1={latitude}&lon1={longitude}&yr1={year}&mon1={month}&day1={day}&hr1={hour}&yr2=&mon2=&day2=&hr2=&anom=0&low=&high=&cint=&lineson=0&aspectratio=1&lat2=&lon2=&submit=Create+Plot%2FGet+Data'
 
     # Send a GET request to fetch the data
-    response = requests.get(url)
+    response = http_client.get(url)
 
     # Check if the request was successful
     if response.status_code == 200:
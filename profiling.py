@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import threading
+import functools
+
+# Call counts and cumulative wall time for the physics functions and the pipeline stages
+# (fetch, fit, train, solve, simulate, plot) of the flight model
+# Off by default: switch on with enable() or by setting FLIGHT_PROFILE=1 in the environment.
+# When off every instrumented call costs one flag check, stage() returns a shared no-op context
+# Times are inclusive, so bouyant_force also contains the balloon_volume_at_height calls it makes
+# The per-step lookups of the simulations are instrumented where they are made (field.velocity, field.conditions,
+# table.*, ensemble.*, drag.forces); the FlightModel wrappers such as bouyant_force only run in the solve stage
+
+_enabled = bool(os.environ.get('FLIGHT_PROFILE'))
+_lock = threading.Lock()
+_counters = {}  # (kind, name) -> [calls, seconds]
+
+def enable():
+    global _enabled
+    _enabled = True
+
+def disable():
+    global _enabled
+    _enabled = False
+
+def is_enabled():
+    return _enabled
+
+def reset():
+    with _lock:
+        _counters.clear()
+
+def _add(kind, name, seconds):
+    with _lock:
+        entry = _counters.get((kind, name))
+        if entry is None:
+            _counters[(kind, name)] = [1, seconds]
+        else:
+            entry[0] += 1
+            entry[1] += seconds
+
+# Decorator counting the calls and time of a function, under its own name unless one is given
+def profiled(name=None):
+    def decorator(function):
+        label = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _add('function', label, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+class _Stage:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _add('stage', self.name, time.perf_counter() - self.start)
+        return False
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NO_STAGE = _NoStage()
+
+# Time a block of the pipeline: with stage('fit'): ...
+def stage(name):
+    return _Stage(name) if _enabled else _NO_STAGE
+
+# Snapshot of the counters as {'stage': {name: {...}}, 'function': {name: {...}}}
+def stats():
+    with _lock:
+        items = sorted(_counters.items())
+    result = {'stage': {}, 'function': {}}
+    for (kind, name), (calls, seconds) in items:
+        result.setdefault(kind, {})[name] = {'calls': calls, 'total_s': seconds, 'mean_us': seconds / calls * 1e6}
+    return result
+
+# Counters as a plain text table, slowest first within stages and functions
+def report():
+    lines = [f"{'kind':<9} {'name':<28} {'calls':>10} {'total (s)':>12} {'mean (us)':>12}"]
+    for kind, entries in stats().items():
+        for name, entry in sorted(entries.items(), key=lambda item: -item[1]['total_s']):
+            lines.append(f"{kind:<9} {name:<28} {entry['calls']:>10} {entry['total_s']:>12.4f} {entry['mean_us']:>12.2f}")
+    return '\n'.join(lines)
+
+# Counters as JSON, also written to path if one is given
+def to_json(path=None):
+    text = json.dumps(stats(), indent=2)
+    if path:
+        with open(path, 'w') as f:
+            f.write(text)
+    return text
@@ -0,0 +1,189 @@
+# Batch runner for declarative flight scenarios
+# Usage: python scenarios.py scenarios/*.json [-o results.npz] [--workers N]
+#
+# A scenario file holds one scenario or a list of them, for example:
+# {"name": "baseline",
+#  "balloon": {"radius": 0.42, "mass_helium": 0.015, "mass_balloon": 0.047, "mass_payload": 0},
+#  "launch": {"year": 2024, "month": 7, "day": 16, "hour": 0, "latitude": 45, "longitude": -125},
+#  "duration": 86400, "time_step": 1, "output_stride": 60, "popping_pressure_difference": 4600}
+# Anything left out takes the model.py defaults; "popping_pressure_difference": null never bursts
+#
+# All results go to one uncompressed .npz with one array per column. np.load(path) reads a column
+# only when it is indexed, so metrics can be queried without touching the trajectories:
+#   results = np.load('results.npz'); results['name'][results['float_altitude'] > 15000]
+# Trajectories of all scenarios are concatenated in the track_* columns, scenario i owns rows
+# track_offsets[i]:track_offsets[i + 1] (see scenario_track)
+
+import os
+import glob
+import json
+import argparse
+import datetime
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from drift import grid_cell, offset_to_latlon
+from launch_window import fetch_soundings
+from trajectory import TRAJECTORY_DTYPE, trajectory_array
+import model
+
+FLOAT_RISE_RATE = 0.1  # m/s, the balloon counts as floating once it rises slower than this
+
+DEFAULT_SCENARIO = {
+    'balloon': {'radius': model.radius, 'mass_helium': model.mass_helium,
+                'mass_balloon': model.mass_balloon, 'mass_payload': model.mass_payload},
+    'launch': {'year': 2024, 'month': 7, 'day': 16, 'hour': 0, 'latitude': 45, 'longitude': -125},
+    'duration': 86400,
+    'time_step': 1,
+    'output_stride': 60,
+    'popping_pressure_difference': model.popping_pressure_difference,
+}
+
+METRIC_COLUMNS = ['float_altitude', 'float_time', 'drift_distance', 'max_altitude', 'burst_time',
+                  'final_latitude', 'final_longitude']
+
+# Scenario with every missing field filled from DEFAULT_SCENARIO
+def complete_scenario(scenario, name=None):
+    complete = dict(DEFAULT_SCENARIO, **scenario)
+    complete['balloon'] = dict(DEFAULT_SCENARIO['balloon'], **scenario.get('balloon', {}))
+    complete['launch'] = dict(DEFAULT_SCENARIO['launch'], **scenario.get('launch', {}))
+    complete.setdefault('name', name)
+    return complete
+
+# Every scenario in the given files, names default to file name and position
+def load_scenarios(paths):
+    scenarios = []
+    for path in paths:
+        with open(path) as f:
+            content = json.load(f)
+        entries = content if isinstance(content, list) else [content]
+        stem = os.path.splitext(os.path.basename(path))[0]
+        for k, entry in enumerate(entries):
+            scenarios.append(complete_scenario(entry, stem if len(entries) == 1 else f'{stem}[{k}]'))
+    return scenarios
+
+def _launch_key(launch):
+    return datetime.date(launch['year'], launch['month'], launch['day']), grid_cell(launch['latitude'], launch['longitude'])
+
+# Fly one scenario in a worker process and reduce it to its metrics and strided track
+def run_scenario(scenario, soundings, hours=(0, 6, 12, 18), cache_dir=model.CACHE_DIR, chunk_size=4096):
+    launch = scenario['launch']
+    balloon = model.Balloon(**scenario['balloon'])
+    flight = model.FlightModel(launch['year'], launch['month'], launch['day'], launch['latitude'], launch['longitude'],
+                               hours, balloon=balloon, soundings=soundings, cache_dir=cache_dir)
+    field = flight.field
+    time_step = scenario['time_step']
+    stride = scenario['output_stride']
+    popping = scenario['popping_pressure_difference']
+    launch_time = launch['hour'] * 3600
+
+    metrics = dict.fromkeys(METRIC_COLUMNS, np.nan)
+    metrics['max_altitude'] = balloon.z
+    float_sum = float_count = 0
+    kept = []
+    step = 0
+    last = None
+    for chunk in flight.stream_trajectory(scenario['duration'], time_step, chunk_size=chunk_size, launch_time=launch_time):
+        burst = False
+        if popping is not None:
+            popped = np.flatnonzero(field.superpressure_at_height(chunk['z'], chunk['t']) > popping)
+            if len(popped):
+                chunk = chunk[:popped[0] + 1]
+                metrics['burst_time'] = chunk['t'][-1] - launch_time
+                burst = True
+        if np.isnan(metrics['float_time']):
+            floating = np.flatnonzero((chunk['vz'] < FLOAT_RISE_RATE) & (chunk['z'] > 1))
+            if len(floating):
+                metrics['float_time'] = chunk['t'][floating[0]] - launch_time
+                float_sum += chunk['z'][floating[0]:].sum()
+                float_count += len(chunk) - floating[0]
+        else:
+            float_sum += chunk['z'].sum()
+            float_count += len(chunk)
+        metrics['max_altitude'] = max(metrics['max_altitude'], chunk['z'].max())
+        kept.append(chunk[-step % stride::stride])
+        step += len(chunk)
+        last = chunk[-1]
+        if burst:
+            break
+
+    if float_count:
+        metrics['float_altitude'] = float_sum / float_count
+    if last is not None:
+        metrics['drift_distance'] = np.hypot(last['x'], last['y'])
+        metrics['final_latitude'], metrics['final_longitude'] = offset_to_latlon(launch['latitude'], launch['longitude'],
+                                                                                last['x'], last['y'])
+    track = np.concatenate(kept) if kept else np.zeros(0, dtype=TRAJECTORY_DTYPE)
+    return metrics, track
+
+# Run every scenario over a process pool and write the columnar results file
+# Soundings are fetched once per launch day and grid cell (with loader, retrieve_tables by default)
+# and shared by every scenario launched there; fitted parameters are shared through the FitCache in cache_dir
+def run_scenarios(scenarios, output_path='results.npz', hours=(0, 6, 12, 18), loader=None, workers=None, fetch_workers=8,
+                  cache_dir=model.CACHE_DIR):
+    keys = [_launch_key(scenario['launch']) for scenario in scenarios]
+    soundings = {}
+    for date in sorted({date for date, _ in keys}):
+        cells = sorted({cell for key_date, cell in keys if key_date == date})
+        soundings.update(fetch_soundings([date], cells, hours, loader, fetch_workers))
+
+    results = [None] * len(scenarios)
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        futures = {}
+        for index, (scenario, key) in enumerate(zip(scenarios, keys)):
+            data = soundings[key]
+            if any(rows is None for rows in data):
+                print(f"Error: No soundings for scenario {scenario['name']}, skipping")
+                continue
+            futures[index] = executor.submit(run_scenario, scenario, data, list(hours), cache_dir)
+        for index, future in futures.items():
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                print(f"Error: Scenario {scenarios[index]['name']} failed: {e}")
+
+    write_results(output_path, scenarios, results)
+    return output_path
+
+# One row per scenario: its definition, metrics and the offsets of its track rows
+def write_results(path, scenarios, results):
+    empty = (dict.fromkeys(METRIC_COLUMNS, np.nan), np.zeros(0, dtype=TRAJECTORY_DTYPE))
+    results = [result or empty for result in results]
+    columns = {
+        'name': np.array([scenario['name'] for scenario in scenarios], dtype=str),
+        'completed': np.array([result is not empty for result in results]),
+        'launch_time': np.array([datetime.datetime(s['launch']['year'], s['launch']['month'], s['launch']['day'], s['launch']['hour'])
+                                 for s in scenarios], dtype='datetime64[s]'),
+        'duration': np.array([scenario['duration'] for scenario in scenarios], dtype=float),
+    }
+    for name in ('latitude', 'longitude'):
+        columns[name] = np.array([scenario['launch'][name] for scenario in scenarios], dtype=float)
+    for name in DEFAULT_SCENARIO['balloon']:
+        columns[name] = np.array([scenario['balloon'][name] for scenario in scenarios], dtype=float)
+    for name in METRIC_COLUMNS:
+        columns[name] = np.array([metrics[name] for metrics, _ in results], dtype=float)
+    tracks = [track for _, track in results]
+    columns['track_offsets'] = np.concatenate([[0], np.cumsum([len(track) for track in tracks])])
+    track = np.concatenate(tracks)
+    for name in TRAJECTORY_DTYPE.names:
+        columns[f'track_{name}'] = track[name]
+    np.savez(path, **columns)
+
+# Trajectory of scenario `index` from an opened results file, as TRAJECTORY_DTYPE records
+def scenario_track(results, index):
+    start, stop = results['track_offsets'][index:index + 2]
+    return trajectory_array(*(results[f'track_{name}'][start:stop] for name in TRAJECTORY_DTYPE.names))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('paths', nargs='+', help='Scenario JSON files (globs are expanded)')
+    parser.add_argument('-o', '--output', default='results.npz', help='Columnar results file to write')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: one per CPU)')
+    args = parser.parse_args()
+
+    paths = sorted(path for pattern in args.paths for path in (glob.glob(pattern) or [pattern]))
+    scenarios = load_scenarios(paths)
+    run_scenarios(scenarios, args.output, workers=args.workers)
+    results = np.load(args.output)
+    for name, completed, altitude, drift in zip(results['name'], results['completed'], results['float_altitude'], results['drift_distance']):
+        status = f"float {altitude:.0f} m, drift {drift / 1000:.1f} km" if completed else "failed"
+        print(f"{name}: {status}")
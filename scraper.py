@@ -1,4 +1,4 @@
-import requests
+import http_client
 from bs4 import BeautifulSoup
 
 def query_noaa_atmospheric_profile(year, month, day, hour, longitude, latitude):
@@ -6,7 +6,7 @@ def query_noaa_atmospheric_profile(year, month, day, hour, longitude, latitude):
     url = 'https://psl.noaa.gov/data/atmoswrit/profile/'
 
     # Send a GET request to fetch the form page
-    response = requests.get(url)
+    response = http_client.get(url)
 
     # Check if the request was successful
     if response.status_code != 200:
@@ -69,7 +69,7 @@ def query_noaa_atmospheric_profile(year, month, day, hour, longitude, latitude):
         action = url + action
 
     # Send a POST request to submit the form with the modified data
-    response = requests.post(action, data=form_data)
+    response = http_client.post(action, data=form_data)
 
     # Check if the request was successful
     if response.status_code == 200:
@@ -0,0 +1,169 @@
+import os
+import numpy as np
+from atmosphere import SOUNDING_DTYPE, sounding_array
+from ncep_scraper import sounding_rows
+
+VARIABLES = SOUNDING_DTYPE.names
+
+# One entry per archived sounding of a site: when it was taken, the chunk (year) holding it, its row there
+# and how many levels it has (chunks are padded with NaN to their widest sounding)
+INDEX_DTYPE = np.dtype([('time', 'datetime64[s]'), ('chunk', 'i4'), ('row', 'i4'), ('levels', 'i4')])
+
+def _save(path, values, compress):
+    temporary = f'{path}.tmp{os.getpid()}'
+    with open(temporary, 'wb') as f:
+        if compress:
+            np.savez_compressed(f, values=values)
+        else:
+            np.save(f, values)
+    os.replace(temporary, path)
+
+# Columnar on-disk store of parsed soundings for climatology work
+# Layout: root/<site>/index.npy plus root/<site>/<variable>/<year>.npz (or .npy), where every chunk is a
+# (soundings, levels) array of one variable for one year. Queries read the memory-mapped index, then only the
+# chunks of the variables asked for that overlap the selection. Compressed chunks are read and decompressed whole;
+# with compress=False the chunks are plain .npy files and are memory-mapped, so only the selected rows are paged in
+# compress only picks the format of chunks written from now on: chunks are read in whichever format is on disk, and a
+# chunk rewritten by flush() is converted to the current format
+# Writes are buffered by add() and merged into the chunks by flush(); files are replaced atomically, so readers
+# never see a half-written chunk, but there should be only one writer per archive at a time
+class SoundingArchive:
+    def __init__(self, root, compress=True):
+        self.root = root
+        self.compress = compress
+        self.pending = {}
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def site(latitude, longitude):
+        return f'{float(latitude):+07.2f}_{float(longitude):+08.2f}'
+
+    def _chunk_path(self, site, variable, chunk, compress=None):
+        compress = self.compress if compress is None else compress
+        return os.path.join(self.root, site, variable, f'{chunk}.npz' if compress else f'{chunk}.npy')
+
+    def _index_path(self, site):
+        return os.path.join(self.root, site, 'index.npy')
+
+    # Index of every archived sounding of a site (memory-mapped)
+    def index(self, latitude, longitude):
+        return self._load_index(self.site(latitude, longitude))
+
+    def _load_index(self, site):
+        path = self._index_path(site)
+        if not os.path.exists(path):
+            return np.zeros(0, dtype=INDEX_DTYPE)
+        return np.load(path, mmap_mode='r')
+
+    def _read_chunk(self, site, variable, chunk):
+        compress = self.compress
+        path = self._chunk_path(site, variable, chunk, compress)
+        if not os.path.exists(path):
+            compress = not compress
+            path = self._chunk_path(site, variable, chunk, compress)
+        if compress:
+            with np.load(path) as stored:
+                return stored['values']
+        return np.load(path, mmap_mode='r')
+
+    # Queue one sounding (rows from retrieve_table or a SOUNDING_DTYPE array) taken at `time`
+    def add(self, latitude, longitude, time, sounding):
+        time = np.datetime64(time, 's')
+        self.pending.setdefault(self.site(latitude, longitude), {})[time] = sounding_array(sounding)
+
+    # Merge every queued sounding into its chunks; a sounding already archived for the same time is replaced
+    def flush(self):
+        for site, entries in self.pending.items():
+            os.makedirs(os.path.join(self.root, site), exist_ok=True)
+            index = np.array(self._load_index(site))
+            years = {}
+            for time, sounding in entries.items():
+                years.setdefault(time.astype('datetime64[Y]').astype(int) + 1970, {})[time] = sounding
+            for chunk, new in years.items():
+                index = np.concatenate([index[index['chunk'] != chunk], self._write_chunk(site, chunk, index, new)])
+            index.sort(order='time')
+            _save(self._index_path(site), index, compress=False)
+            # Chunks stored in the other format before this rewrite are stale once the new index is in place
+            for chunk in years:
+                for variable in VARIABLES:
+                    stale = self._chunk_path(site, variable, chunk, not self.compress)
+                    if os.path.exists(stale):
+                        os.remove(stale)
+        self.pending = {}
+
+    def _write_chunk(self, site, chunk, index, new):
+        soundings = {}
+        old = index[index['chunk'] == chunk]
+        if len(old):
+            stored = {variable: self._read_chunk(site, variable, chunk) for variable in VARIABLES}
+            for entry in old:
+                sounding = np.empty(entry['levels'], dtype=SOUNDING_DTYPE)
+                for variable in VARIABLES:
+                    sounding[variable] = stored[variable][entry['row'], :entry['levels']]
+                soundings[entry['time']] = sounding
+        soundings.update(new)
+
+        times = sorted(soundings)
+        width = max(len(soundings[time]) for time in times)
+        entries = np.zeros(len(times), dtype=INDEX_DTYPE)
+        entries['time'] = times
+        entries['chunk'] = chunk
+        entries['row'] = np.arange(len(times))
+        entries['levels'] = [len(soundings[time]) for time in times]
+        for variable in VARIABLES:
+            values = np.full((len(times), width), np.nan)
+            for row, time in enumerate(times):
+                values[row, :len(soundings[time])] = soundings[time][variable]
+            os.makedirs(os.path.dirname(self._chunk_path(site, variable, chunk)), exist_ok=True)
+            _save(self._chunk_path(site, variable, chunk), values, self.compress)
+        return entries
+
+    # Soundings of one site, optionally limited to [start, end) and to some UTC hours and months (1-12)
+    # e.g. query(45, -125, '2000-01-01', '2025-01-01', hours=[12], months=[7]) for every July 12 UTC profile
+    # Returns (times, soundings, levels): soundings is a (n, max levels) SOUNDING_DTYPE array padded with NaN,
+    # sounding i has levels[i] levels. Variables not asked for stay NaN and are never read from disk
+    def query(self, latitude, longitude, start=None, end=None, hours=None, months=None, variables=VARIABLES):
+        site = self.site(latitude, longitude)
+        index = self.index(latitude, longitude)
+        times = index['time']
+        selected = np.ones(len(index), dtype=bool)
+        if start is not None:
+            selected &= times >= np.datetime64(start, 's')
+        if end is not None:
+            selected &= times < np.datetime64(end, 's')
+        if hours is not None:
+            selected &= np.isin((times - times.astype('datetime64[D]')).astype('timedelta64[h]').astype(int), hours)
+        if months is not None:
+            selected &= np.isin(times.astype('datetime64[M]').astype(int) % 12 + 1, months)
+        entries = index[selected]
+
+        width = int(entries['levels'].max()) if len(entries) else 0
+        soundings = np.empty((len(entries), width), dtype=SOUNDING_DTYPE)
+        for variable in VARIABLES:
+            soundings[variable] = np.nan
+        # The index is sorted by time, so each chunk's entries are one contiguous block
+        chunks = entries['chunk']
+        for chunk in np.unique(chunks):
+            first, last = np.searchsorted(chunks, chunk), np.searchsorted(chunks, chunk, side='right')
+            rows = entries['row'][first:last]
+            # A plain time range selects consecutive rows, read them as a slice instead of gathering
+            if rows[-1] - rows[0] + 1 == len(rows):
+                rows = slice(rows[0], rows[-1] + 1)
+            for variable in variables:
+                values = self._read_chunk(site, variable, chunk)[rows]
+                soundings[variable][first:last, :values.shape[1]] = values[:, :width]
+        return entries['time'].copy(), soundings, entries['levels'].copy()
+
+    # One archived sounding as a SOUNDING_DTYPE array, or None if it is not archived
+    # Has the signature of retrieve_array, so it can be passed as loader to launch_window and scenarios
+    def sounding(self, year, month, day, hour, latitude, longitude):
+        time = np.datetime64(f'{int(year):04d}-{int(month):02d}-{int(day):02d}T{int(hour):02d}', 's')
+        times, soundings, levels = self.query(latitude, longitude, time, time + np.timedelta64(1, 's'))
+        if not len(times):
+            return None
+        return soundings[0, :levels[0]]
+
+    # The same as retrieve_table rows, for callers that want the legacy format
+    def table(self, year, month, day, hour, latitude, longitude):
+        sounding = self.sounding(year, month, day, hour, latitude, longitude)
+        return None if sounding is None else sounding_rows(sounding)
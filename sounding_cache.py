@@ -0,0 +1,49 @@
+import json
+import time
+import numpy as np
+from atmosphere import SOUNDING_DTYPE, sounding_array
+from sqlite_cache import SqliteCache
+
+# Scraped soundings stored in one SQLite file, keyed by (year, month, day, hour, latitude, longitude)
+# Reanalysis data for a past date never changes, so an entry never goes stale
+# Soundings are stored as the raw bytes of their SOUNDING_DTYPE array; entries written as JSON rows by
+# earlier versions are still read
+# With max_bytes set the least recently used entries are evicted once the stored rows grow past it
+# Locking, WAL mode and eviction come from SqliteCache
+class SoundingCache(SqliteCache):
+    table = 'soundings'
+
+    def __init__(self, path, max_bytes=None):
+        super().__init__(path, 'year INTEGER, month INTEGER, day INTEGER, hour INTEGER, latitude REAL, longitude REAL, '
+                               'header TEXT, rows BLOB, size INTEGER, last_used REAL, '
+                               'PRIMARY KEY (year, month, day, hour, latitude, longitude)', max_bytes)
+
+    # Form fields arrive as strings from the GUI, so every key is normalised to numbers
+    @staticmethod
+    def key(year, month, day, hour, latitude, longitude):
+        return int(year), int(month), int(day), int(hour), float(latitude), float(longitude)
+
+    # (header, SOUNDING_DTYPE array) of a stored sounding, or None
+    def get(self, year, month, day, hour, latitude, longitude):
+        key = self.key(year, month, day, hour, latitude, longitude)
+        with self._connect() as connection:
+            row = connection.execute('SELECT header, rows FROM soundings WHERE year = ? AND month = ? AND day = ? AND hour = ? '
+                                     'AND latitude = ? AND longitude = ?', key).fetchone()
+            if row is None:
+                return None
+            connection.execute('UPDATE soundings SET last_used = ? WHERE year = ? AND month = ? AND day = ? AND hour = ? '
+                               'AND latitude = ? AND longitude = ?', (time.time(),) + key)
+        header, rows = row
+        if isinstance(rows, str):
+            return json.loads(header), sounding_array(json.loads(rows))
+        return json.loads(header), np.frombuffer(rows, dtype=SOUNDING_DTYPE).copy()
+
+    # sounding is a SOUNDING_DTYPE array or rows like retrieve_table returns
+    def put(self, year, month, day, hour, latitude, longitude, header, sounding):
+        key = self.key(year, month, day, hour, latitude, longitude)
+        header = json.dumps(header)
+        rows = np.ascontiguousarray(sounding_array(sounding)).tobytes()
+        with self._connect() as connection:
+            connection.execute('INSERT OR REPLACE INTO soundings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                               key + (header, rows, len(header) + len(rows), time.time()))
+        self.evict()
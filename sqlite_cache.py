@@ -0,0 +1,36 @@
+import sqlite3
+
+# Shared SQLite plumbing of FitCache and SoundingCache: one table in one file, opened in WAL mode so readers
+# do not wait on a writer, with size and last_used columns for least recently used eviction
+# SQLite handles locking, so several processes can share one cache file
+# Subclasses set table and pass the column definitions of that table
+class SqliteCache:
+    table = None
+
+    def __init__(self, path, columns, max_bytes=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        with self._connect() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(f'CREATE TABLE IF NOT EXISTS {self.table} ({columns})')
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    # Drop least recently used entries until the cache fits in max_bytes
+    def evict(self):
+        if self.max_bytes is None:
+            return
+        with self._connect() as connection:
+            total = connection.execute(f'SELECT COALESCE(SUM(size), 0) FROM {self.table}').fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            for rowid, size in connection.execute(f'SELECT rowid, size FROM {self.table} ORDER BY last_used').fetchall():
+                connection.execute(f'DELETE FROM {self.table} WHERE rowid = ?', (rowid,))
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def __len__(self):
+        with self._connect() as connection:
+            return connection.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
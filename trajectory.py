@@ -0,0 +1,115 @@
+import math
+import numpy as np
+
+# One record per kept step: time (s), position (m) and velocity (m/s)
+TRAJECTORY_DTYPE = np.dtype([('t', 'f8'), ('x', 'f8'), ('y', 'f8'), ('z', 'f8'),
+                             ('vx', 'f8'), ('vy', 'f8'), ('vz', 'f8')])
+
+# Pack matching arrays of times, positions and velocities into one structured trajectory array
+def trajectory_array(t, x, y, z, vx=0.0, vy=0.0, vz=0.0):
+    t = np.asarray(t)
+    records = np.zeros(np.broadcast(t, x, y, z).shape, dtype=TRAJECTORY_DTYPE)
+    for name, values in zip(TRAJECTORY_DTYPE.names, (t, x, y, z, vx, vy, vz)):
+        records[name] = values
+    return records
+
+# Rewrite the shape in a .npy header without moving the data, then cut off the unused rows
+# The new shape is never longer than the old one, so the header is padded back to its original length
+def _shrink_npy(path, shape):
+    with open(path, 'r+b') as f:
+        version = np.lib.format.read_magic(f)
+        start = f.tell() + (2 if version == (1, 0) else 4)
+        if version == (1, 0):
+            _, _, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            _, _, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+        header = "{'descr': %r, 'fortran_order': False, 'shape': %r, }" % (np.lib.format.dtype_to_descr(dtype), shape)
+        header += ' ' * (offset - start - len(header) - 1) + '\n'
+        f.seek(start)
+        f.write(header.encode('latin1'))
+        f.truncate(offset + math.prod(shape) * dtype.itemsize)
+
+# Records a trajectory into a preallocated structured array instead of writing text every step
+# Only every stride-th step is kept. With a path the array is a memory-mapped .npy file, so a long
+# run is written by the OS in bulk and can be opened later with np.load(path, mmap_mode='r')
+# Without members it records one balloon, giving records of shape (n_records,)
+# With members (an ensemble size, 1 included) it records the whole ensemble per step, giving (n_records, members)
+class TrajectoryRecorder:
+    def __init__(self, n_steps, members=None, stride=1, path=None):
+        self.stride = stride
+        self.path = path
+        self.count = 0
+        capacity = -(-n_steps // stride)
+        shape = (capacity,) if members is None else (capacity, members)
+        if path is None:
+            self.records = np.zeros(shape, dtype=TRAJECTORY_DTYPE)
+        else:
+            self.records = np.lib.format.open_memmap(path, mode='w+', dtype=TRAJECTORY_DTYPE, shape=shape)
+
+    # Store the state of step number `step` if it falls on the stride
+    def record(self, step, t, x, y, z, vx=0.0, vy=0.0, vz=0.0):
+        if step % self.stride:
+            return
+        if self.records.ndim == 1:
+            self.records[self.count] = (t, x, y, z, vx, vy, vz)
+        else:
+            row = self.records[self.count]
+            row['t'] = t
+            row['x'] = x
+            row['y'] = y
+            row['z'] = z
+            row['vx'] = vx
+            row['vy'] = vy
+            row['vz'] = vz
+        self.count += 1
+
+    # Store a block of consecutive records whose first one is step number `first_step`
+    def extend(self, first_step, records):
+        offset = -first_step % self.stride
+        kept = records[offset::self.stride]
+        self.records[self.count:self.count + len(kept)] = kept
+        self.count += len(kept)
+
+    # Flush to disk and trim to the records actually written
+    # Afterwards self.records holds the trimmed array (read-only memory map when backed by a file)
+    def close(self):
+        if self.path is None:
+            self.records = self.records[:self.count]
+            return self.records
+        shape = (self.count,) + self.records.shape[1:]
+        full = self.count == len(self.records)
+        self.records.flush()
+        del self.records
+        if not full:
+            _shrink_npy(self.path, shape)
+        self.records = np.load(self.path, mmap_mode='r')
+        return self.records
+
+# Largest-Triangle-Three-Buckets downsampling of a series to at most n_out points
+# Keeps the first and last point and, from every bucket in between, the point that makes the largest
+# triangle with the previously kept point and the mean of the next bucket, so peaks and turns survive
+# Returns the indices of the kept points
+def lttb(x, y, n_out):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])[:max(n_out, 0)]
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    kept = np.empty(n_out, dtype=int)
+    kept[0] = 0
+    kept[-1] = n - 1
+    previous = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        next_stop = edges[i + 2] if i + 2 < len(edges) else n
+        mean_x = x[stop:next_stop].mean()
+        mean_y = y[stop:next_stop].mean()
+        area = np.abs((x[previous] - mean_x) * (y[start:stop] - y[previous])
+                      - (x[previous] - x[start:stop]) * (mean_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        kept[i + 1] = previous
+    return kept
@@ -12,7 +12,7 @@
 # =============================================================================
 
 import json
-import requests
+import http_client
 import sys
 import time
 import argparse
@@ -33,10 +33,10 @@ def sendRequest(url, data, apiKey = None):
     json_data = json.dumps(data)
     
     if apiKey == None:
-        response = requests.post(url, json_data)
+        response = http_client.post(url, json_data)
     else:
         headers = {'X-Auth-Token': apiKey}              
-        response = requests.post(url, json_data, headers = headers)    
+        response = http_client.post(url, json_data, headers = headers)    
     
     try:
       httpStatusCode = response.status_code 
@@ -71,7 +71,7 @@ def downloadFile(url):
     sema.acquire()
     global path
     try:        
-        response = requests.get(url, stream=True)
+        response = http_client.get(url, stream=True)
         disposition = response.headers['content-disposition']
         filename = re.findall("filename=(.+)", disposition)[0].strip("\"")
         print(f"Downloading {filename} ...\n")